@@ -0,0 +1,40 @@
+# shared sandpile engine used by the simulation scripts
+from .engine import (K, ENGINE_VERSION, DTYPE, ENGINES, DEFAULT_ENGINE, compact, topple,
+                     run_avalanche, relax_frontier, relax_compiled, relax, Observation,
+                     relax_observed, relax_profiled)
+from .batch import topple_batch, relax_batch, simulate_batch
+from .drive import STRATEGIES, initialize_grid, simulate, site_streams, batch_sites
+from .cache import stable_state, load_grid
+from .ensemble import Job, run_ensemble
+from .stats import AvalancheStats
+from .analysis import Fit, Estimate, size_counts, log_binned, fit_power_law, bootstrap, estimate
+from .green import mean_size_map, predicted_mean, validate
+from .observables import AvalancheRecord
+from .activity import ActivityMap
+from .frames import AvalancheFrames, record_avalanche
+from .eventlog import EventLog, read_events, events_stats
+from .warmup import Round, WarmUp, is_recurrent, stationary, warm_up
+from .metrics import MetricsPublisher, watch
+from .hooks import Hooks, SweepCounter, SweepTimer, FrontierTrace, Progress
+from .models import LATTICES, BOUNDARIES, Model
+
+__all__ = [
+    'K', 'ENGINE_VERSION', 'DTYPE', 'ENGINES', 'DEFAULT_ENGINE', 'compact', 'topple',
+    'run_avalanche', 'relax_frontier', 'relax_compiled', 'relax', 'Observation',
+    'relax_observed', 'relax_profiled',
+    'topple_batch', 'relax_batch', 'simulate_batch',
+    'STRATEGIES', 'initialize_grid', 'simulate', 'site_streams', 'batch_sites',
+    'stable_state', 'load_grid',
+    'Job', 'run_ensemble',
+    'AvalancheStats',
+    'Fit', 'Estimate', 'size_counts', 'log_binned', 'fit_power_law', 'bootstrap', 'estimate',
+    'mean_size_map', 'predicted_mean', 'validate',
+    'AvalancheRecord',
+    'ActivityMap',
+    'AvalancheFrames', 'record_avalanche',
+    'EventLog', 'read_events', 'events_stats',
+    'Round', 'WarmUp', 'is_recurrent', 'stationary', 'warm_up',
+    'MetricsPublisher', 'watch',
+    'Hooks', 'SweepCounter', 'SweepTimer', 'FrontierTrace', 'Progress',
+    'LATTICES', 'BOUNDARIES', 'Model',
+]
@@ -0,0 +1,150 @@
+import os
+
+import numpy as np
+
+# files of the per-avalanche history written by ActivityMap.write_history()
+HISTORY = {'cells': np.int32, 'topplings': np.int32, 'ends': np.int64}
+
+
+class ActivityMap:
+    # per-cell toppling counts (odometers) of the avalanches relaxed by
+    # relax_observed() or simulate(): summed over the run in `total` and,
+    # unless sparse=False, kept per avalanche as the cells that toppled
+    # (flat indices) and how often each did. The per-avalanche entries are
+    # stored back to back in arrays that are doubled when full, avalanche n
+    # owning entries offsets[n]:offsets[n + 1], so memory grows with the
+    # number of topplings rather than with N*N per avalanche
+
+    def __init__(self, shape, sparse=True, capacity=1 << 16):
+        self.shape = tuple(shape)
+        self.sparse = sparse
+        self.total = np.zeros(self.shape, dtype=np.int64)
+        # what the engines add to during an avalanche; all zero in between
+        self.odometer = np.zeros(self.total.size, dtype=np.int64)
+        self._cells = np.zeros(capacity if sparse else 0, dtype=np.int32)
+        self._topplings = np.zeros(capacity if sparse else 0, dtype=np.int32)
+        self._offsets = np.zeros(1024 if sparse else 1, dtype=np.int64)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, cells):
+        # takes the counts of one avalanche, which toppled the given cells,
+        # out of the odometer
+        topplings = self.odometer[cells]
+        self.total.reshape(-1)[cells] += topplings
+        self.odometer[cells] = 0
+        if self.sparse:
+            n, used = self.count, self._offsets[self.count]
+            if n + 1 == self._offsets.size:
+                self._offsets = self._grow(self._offsets, n + 1, 2 * (n + 1))
+            if used + cells.size > self._cells.size:
+                size = max(2 * self._cells.size, used + cells.size)
+                self._cells = self._grow(self._cells, used, size)
+                self._topplings = self._grow(self._topplings, used, size)
+            self._cells[used:used + cells.size] = cells
+            self._topplings[used:used + cells.size] = topplings
+            self._offsets[n + 1] = used + cells.size
+        self.count += 1
+
+    @staticmethod
+    def _grow(column, used, size):
+        grown = np.zeros(size, dtype=column.dtype)
+        grown[:used] = column[:used]
+        return grown
+
+    def avalanche(self, n):
+        # (cells, topplings) of avalanche n, the cells as flat indices
+        if not self.sparse:
+            raise ValueError("per-avalanche counts are kept only with sparse=True")
+        if not 0 <= n < self.count:
+            raise IndexError(f"avalanche {n} out of range for {self.count} avalanches")
+        a, b = self._offsets[n], self._offsets[n + 1]
+        return self._cells[a:b], self._topplings[a:b]
+
+    def avalanche_map(self, n):
+        # the counts of avalanche n as a full grid
+        cells, topplings = self.avalanche(n)
+        counts = np.zeros(self.shape, dtype=np.int64)
+        counts.reshape(-1)[cells] = topplings
+        return counts
+
+    def state(self):
+        # the maps as plain arrays, for save() and checkpoints
+        used = self._offsets[self.count] if self.sparse else 0
+        return {'shape': np.array(self.shape), 'sparse': np.array(self.sparse),
+                'total': self.total, 'count': np.array(self.count),
+                'cells': self._cells[:used], 'topplings': self._topplings[:used],
+                'offsets': self._offsets[:self.count + 1] if self.sparse else self._offsets[:1]}
+
+    @classmethod
+    def from_state(cls, state):
+        activity = cls(tuple(int(x) for x in state['shape']), bool(state['sparse']), capacity=0)
+        activity.total[...] = state['total']
+        activity.count = int(state['count'])
+        activity._cells = np.array(state['cells'], dtype=np.int32)
+        activity._topplings = np.array(state['topplings'], dtype=np.int32)
+        activity._offsets = np.array(state['offsets'], dtype=np.int64)
+        return activity
+
+    def summary_state(self):
+        # state() without the per-avalanche entries, which checkpoints keep
+        # in the history files instead
+        return {'shape': np.array(self.shape), 'sparse': np.array(self.sparse),
+                'total': self.total, 'count': np.array(self.count)}
+
+    def write_history(self, directory, start=0):
+        # appends the entries of avalanches start..count-1 to append-only
+        # files in directory (cells.bin and topplings.bin, and ends.bin with
+        # the end of every avalanche's entries), first cutting them back to
+        # their first `start` avalanches, so that saving a long run again and
+        # again only writes what is new. Maps with sparse=False have none
+        if not self.sparse:
+            return
+        os.makedirs(directory, exist_ok=True)
+        used, end = int(self._offsets[start]), int(self._offsets[self.count])
+        # (entries kept, entries to append) of every file
+        columns = {'cells': (used, self._cells[used:end]),
+                   'topplings': (used, self._topplings[used:end]),
+                   'ends': (start, self._offsets[start + 1:self.count + 1])}
+        for name, (kept, new) in columns.items():
+            path = os.path.join(directory, f'{name}.bin')
+            if start and not os.path.exists(path):
+                raise ValueError(f"activity history {directory} has no {name}.bin")
+            with open(path, 'r+b' if start else 'wb') as f:
+                length = kept * np.dtype(HISTORY[name]).itemsize
+                if os.fstat(f.fileno()).st_size < length:
+                    raise ValueError(f"activity history {directory} has fewer than {start} avalanches")
+                f.truncate(length)
+                f.seek(0, os.SEEK_END)
+                new.astype(HISTORY[name], copy=False).tofile(f)
+
+    @classmethod
+    def read_history(cls, state, directory):
+        # rebuilds a map from its summary_state() and the first `count`
+        # avalanches of the history files in directory
+        state = dict(state)
+        count = int(state['count'])
+        if bool(state['sparse']):
+            ends = np.fromfile(os.path.join(directory, 'ends.bin'), dtype=HISTORY['ends'], count=count)
+            if ends.size < count:
+                raise ValueError(f"activity history {directory} has fewer than {count} avalanches")
+            used = int(ends[-1]) if count else 0
+            for name in ('cells', 'topplings'):
+                state[name] = np.fromfile(os.path.join(directory, f'{name}.bin'), dtype=HISTORY[name],
+                                          count=used)
+                if state[name].size < used:
+                    raise ValueError(f"activity history {directory} is cut short")
+            state['offsets'] = np.concatenate([[0], ends])
+        else:
+            state.update(cells=np.zeros(0), topplings=np.zeros(0), offsets=np.zeros(1))
+        return cls.from_state(state)
+
+    def save(self, path):
+        np.savez_compressed(path, **self.state())
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls.from_state({key: data[key] for key in data.files})
@@ -0,0 +1,195 @@
+# Avalanche-size analysis: exact size counts, log-binned densities and
+# maximum-likelihood fits of the size distribution
+#
+#     P(s) ~ s**-tau * exp(-s / cutoff),   s_min <= s <= s_max
+#
+# (a power law with an exponential cutoff, or a pure power law with
+# cutoff=False). Everything works on the histogram of sizes, counts[s],
+# never on the events themselves: the model is an exponential family whose
+# likelihood only needs the number of events and the sums of log(s) and s,
+# so a fit costs O(s_max) whatever the number of events. Bootstrap samples
+# are drawn the same way, as multinomial counts over the observed sizes,
+# which is equivalent to resampling the events with replacement, and are
+# fitted in parallel worker processes.
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .stats import AvalancheStats
+
+# one fit: the exponent and cutoff (inf without one), the fitted range, the
+# number of events in it and the log-likelihood per event
+Fit = namedtuple('Fit', ['tau', 'cutoff', 's_min', 's_max', 'n', 'loglik'])
+
+# a fit with bootstrap confidence intervals (low, high) of tau and cutoff
+Estimate = namedtuple('Estimate', ['fit', 'tau_ci', 'cutoff_ci', 'resamples', 'level'])
+
+
+def size_counts(sizes, chunk=1 << 24):
+    # counts[s] = number of avalanches of size s, from an array of sizes (such
+    # as a memory-mapped event log column, read chunk by chunk), an
+    # AvalancheStats collector or an existing histogram
+    if isinstance(sizes, AvalancheStats):
+        return _histogram(sizes)
+    counts = np.zeros(0, dtype=np.int64)
+    for start in range(0, len(sizes), chunk):
+        part = np.bincount(np.asarray(sizes[start:start + chunk], dtype=np.int64))
+        if part.size > counts.size:
+            part[:counts.size] += counts
+            counts = part
+        else:
+            counts[:part.size] += part
+    return counts
+
+
+def log_binned(counts, bins_per_decade=10, s_min=1):
+    # (lower bin edges, probability density) of the sizes from s_min up, in
+    # bins_per_decade logarithmic bins per decade with integer edges: the
+    # fraction of avalanches in a bin divided by the number of sizes it spans
+    counts = _histogram(counts)
+    top = counts.size
+    if top <= s_min or not counts[s_min:].any():
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    decades = np.log10(top) + 1 / bins_per_decade
+    edges = np.unique(np.ceil(s_min * 10 ** (np.arange(int(decades * bins_per_decade) + 2)
+                                             / bins_per_decade)).astype(np.int64))
+    edges = edges[edges <= top]
+    if edges[-1] < top:
+        edges = np.append(edges, top)
+    cumulative = np.concatenate([[0], np.cumsum(counts, dtype=np.int64)])
+    in_bin = cumulative[edges[1:]] - cumulative[edges[:-1]]
+    density = in_bin / (np.diff(edges) * (cumulative[-1] - cumulative[s_min]))
+    return edges[:-1], density
+
+
+def _histogram(counts):
+    # counts[s] from a histogram or an AvalancheStats collector
+    if isinstance(counts, AvalancheStats):
+        return counts.histogram[:(counts.max or 0) + 1]
+    return np.asarray(counts)
+
+
+def _moments(counts, s_min, s_max):
+    # number of events and mean log(s) and mean s over [s_min, s_max]
+    s = np.arange(s_min, s_max + 1, dtype=np.float64)
+    c = np.asarray(counts[s_min:s_max + 1], dtype=np.float64)
+    n = c.sum()
+    if n == 0:
+        raise ValueError(f"no avalanches with sizes in [{s_min}, {s_max}]")
+    return n, np.array([c @ np.log(s) / n, c @ s / n])
+
+
+class _Model:
+    # the truncated power law with cutoff on the integers s_min..s_max, as an
+    # exponential family with natural parameters (-tau, -rate) and
+    # statistics (log s, s)
+
+    def __init__(self, s_min, s_max):
+        s = np.arange(s_min, s_max + 1, dtype=np.float64)
+        self.x = np.stack([np.log(s), s])
+
+    def evaluate(self, theta, mean):
+        # log-likelihood per event, its gradient and its Hessian
+        exponent = -(theta @ self.x)
+        top = exponent.max()
+        w = np.exp(exponent - top)
+        z = w.sum()
+        p = w / z
+        expected = self.x @ p
+        centred = self.x - expected[:, None]
+        covariance = (centred * p) @ centred.T
+        loglik = -(theta @ mean) - (top + np.log(z))
+        return loglik, expected - mean, -covariance
+
+
+def _fit(model, mean, cutoff, tau=1.5, tolerance=1e-10, iterations=100):
+    # Newton's method with step halving on the concave log-likelihood; the
+    # rate 1 / cutoff is kept >= 0
+    theta = np.array([tau, 0.0])
+    loglik, gradient, hessian = model.evaluate(theta, mean)
+    for _ in range(iterations):
+        free = [0, 1] if cutoff and (theta[1] > 0 or gradient[1] > 0) else [0]
+        step = np.zeros(2)
+        step[free] = np.linalg.solve(-hessian[np.ix_(free, free)], gradient[free])
+        scale = 1.0
+        while True:
+            trial = theta + scale * step
+            trial[1] = max(trial[1], 0.0)
+            new = model.evaluate(trial, mean)
+            if new[0] >= loglik - 1e-15 or scale < 1e-12:
+                break
+            scale /= 2
+        done = abs(new[0] - loglik) < tolerance
+        theta, (loglik, gradient, hessian) = trial, new
+        if done:
+            break
+    return theta, loglik
+
+
+def fit_power_law(counts, s_min=1, s_max=None, cutoff=True):
+    # maximum-likelihood fit of the sizes counts[s] in [s_min, s_max]
+    # (s_max defaults to the largest size seen) as a Fit; counts is a
+    # histogram (see size_counts) or an AvalancheStats collector
+    counts = _histogram(counts)
+    if s_max is None:
+        s_max = int(np.flatnonzero(counts)[-1]) if counts.any() else s_min
+    s_max = min(s_max, counts.size - 1)
+    n, mean = _moments(counts, s_min, s_max)
+    theta, loglik = _fit(_Model(s_min, s_max), mean, cutoff)
+    return Fit(float(theta[0]), float(1 / theta[1]) if theta[1] > 0 else float('inf'), s_min, s_max,
+               int(n), float(loglik))
+
+
+def _bootstrap(counts, s_min, s_max, cutoff, tau, seeds):
+    # fits of multinomial resamples of counts[s_min:s_max + 1], one per seed
+    window = np.asarray(counts[s_min:s_max + 1], dtype=np.int64)
+    n = int(window.sum())
+    p = window / n
+    model = _Model(s_min, s_max)
+    s = np.arange(s_min, s_max + 1, dtype=np.float64)
+    log_s = np.log(s)
+    results = np.zeros((len(seeds), 2))
+    for k, seed in enumerate(seeds):
+        sample = np.random.default_rng(seed).multinomial(n, p).astype(np.float64)
+        mean = np.array([sample @ log_s, sample @ s]) / n
+        theta, _ = _fit(model, mean, cutoff, tau)
+        results[k] = theta[0], (1 / theta[1] if theta[1] > 0 else np.inf)
+    return results
+
+
+def bootstrap(counts, fit, resamples=200, seed=0, workers=None, cutoff=True):
+    # (tau, cutoff) of `resamples` bootstrap resamples of the data behind
+    # fit, as a (resamples, 2) array. Each resample has its own stream
+    # spawned from seed, so the result does not depend on the number of
+    # worker processes (default: one per CPU). cutoff=False refits a pure
+    # power law
+    counts = _histogram(counts)[:fit.s_max + 1]
+    seeds = np.random.SeedSequence(seed).spawn(resamples)
+    workers = min(workers or os.cpu_count() or 1, resamples)
+    parts = [seeds[k::workers] for k in range(workers)]
+    args = (counts, fit.s_min, fit.s_max, cutoff, fit.tau)
+    if workers <= 1:
+        results = [_bootstrap(*args, part) for part in parts]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_bootstrap, *zip(*[args] * workers), parts))
+    samples = np.zeros((resamples, 2))
+    for k, part in enumerate(results):
+        samples[k::workers] = part
+    return samples
+
+
+def estimate(counts, s_min=1, s_max=None, cutoff=True, resamples=200, level=0.95, seed=0,
+             workers=None):
+    # the fit with percentile bootstrap confidence intervals at the given level
+    counts = _histogram(counts)
+    fit = fit_power_law(counts, s_min, s_max, cutoff)
+    tau_ci = cutoff_ci = (float('nan'), float('nan'))
+    if resamples:
+        samples = bootstrap(counts, fit, resamples, seed, workers, cutoff)
+        q = [50 * (1 - level), 50 * (1 + level)]
+        tau_ci = tuple(float(x) for x in np.percentile(samples[:, 0], q))
+        cutoff_ci = tuple(float(x) for x in np.percentile(samples[:, 1], q, method='nearest'))
+    return Estimate(fit, tau_ci, cutoff_ci, resamples, level)
@@ -0,0 +1,58 @@
+import numpy as np
+
+from .engine import K, zero_boundary
+
+
+def topple_batch(grids, K=K):
+    # performs one synchronous update of every grid in a (B, N, N) stack in
+    # place and returns the number of topplings per replica
+    interior = grids[:, 1:-1, 1:-1]
+    unstable = interior > K
+    topple_counts = np.count_nonzero(unstable, axis=(1, 2))
+    if topple_counts.any():
+        u = unstable.astype(grids.dtype)
+        interior -= 4 * u
+        grids[:, 2:, 1:-1] += u
+        grids[:, :-2, 1:-1] += u
+        grids[:, 1:-1, 2:] += u
+        grids[:, 1:-1, :-2] += u
+    zero_boundary(grids)
+    return topple_counts
+
+
+def relax_batch(grids, K=K):
+    # runs the avalanches of all replicas together until every one of them is
+    # stable and returns the avalanche size of each replica. Replicas that are
+    # already stable are dropped from the working stack so they are not swept
+    B = grids.shape[0]
+    avalanche_sizes = np.zeros(B, dtype=np.int64)
+    active = np.arange(B)
+    work = grids
+    while active.size:
+        counts = topple_batch(work, K)
+        avalanche_sizes[active] += counts
+        done = counts == 0
+        if done.any():
+            if work is not grids:
+                grids[active] = work
+            active = active[~done]
+            work = grids[active]
+    return avalanche_sizes
+
+
+def simulate_batch(grids, sites, K=K):
+    # drives B independent sandpiles at once: at step t replica b gets one
+    # grain at sites[t, b] and all replicas are relaxed together.
+    # grids: (B, N, N) array, modified in place
+    # sites: (num_avalanches, B, 2) array of drop sites
+    # returns a (B, num_avalanches) array of avalanche sizes per replica
+    sites = np.asarray(sites)
+    num_avalanches, B = sites.shape[:2]
+    if grids.ndim != 3 or grids.shape[0] != B:
+        raise ValueError(f"expected {B} grids of shape (N, N), got array of shape {grids.shape}")
+    replicas = np.arange(B)
+    avalanche_sizes = np.zeros((B, num_avalanches), dtype=np.int64)
+    for t in range(num_avalanches):
+        grids[replicas, sites[t, :, 0], sites[t, :, 1]] += 1
+        avalanche_sizes[:, t] = relax_batch(grids, K)
+    return avalanche_sizes
@@ -0,0 +1,219 @@
+# benchmarks of the relaxation engines (run with `python -m sandpile bench`).
+# Each case times one workload with one engine on an N x N grid and reports
+# topplings per second and the peak memory the workload allocated:
+#
+#   topple   synchronous sweeps of topple() over the uniform V state
+#   relax    relaxing the uniform V state to stability (c.py)
+#   single   single-grain avalanches, each from the same stable state (d.py)
+#   drive    sustained driving with random drops from the stable state (e.py, f.py)
+#
+# Results are plain dicts so they can be written as JSON and compared with a
+# stored baseline by compare().
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from . import cache, kernels
+from .drive import V, initialize_grid, random_sites, simulate
+from .engine import DTYPE, ENGINE_VERSION, ENGINES, K, clear_buffers, relax, topple
+from .stats import AvalancheStats
+
+WORKLOADS = ('topple', 'relax', 'single', 'drive')
+SIZES = (50, 200, 1024, 4096)
+
+# relaxing the uniform V state takes seconds up to this size and hours well
+# beyond it, so larger grids start from a synthetic state unless cached
+STABLE_MAX_N = 256
+
+# single-site height probabilities of the recurrent state for K = 3
+RECURRENT_HEIGHTS = (0.0736, 0.1739, 0.3063, 0.4462)
+
+
+def synthetic_state(N, K=K, seed=0):
+    # a stable grid whose heights follow the recurrent single-site
+    # distribution; avalanches on it cost about what they cost on the real
+    # recurrent state, which is out of reach for large N
+    rng = np.random.default_rng(seed)
+    p = np.array(RECURRENT_HEIGHTS) if K == 3 else np.ones(K + 1)
+    grid = rng.choice(K + 1, size=(N, N), p=p / p.sum()).astype(DTYPE)
+    grid[[0, -1], :] = grid[:, [0, -1]] = 0
+    return grid
+
+
+def start_state(N, K=K):
+    # the driven workloads start from the cached stable state where it is
+    # affordable and from synthetic_state() otherwise; returns (grid, kind)
+    if N <= STABLE_MAX_N or cache.is_cached(N, V, K):
+        return np.array(cache.stable_state(N, V, K)), 'stable'
+    return synthetic_state(N, K), 'synthetic'
+
+
+def _topple(grid, engine, K, count, rng):
+    t = time.perf_counter()
+    topplings = sum(topple(grid, K) for _ in range(count))
+    return topplings, time.perf_counter() - t
+
+
+def _relax(grid, engine, K, count, rng):
+    t = time.perf_counter()
+    topplings = relax(grid, None, K, engine)
+    return topplings, time.perf_counter() - t
+
+
+def _single(grid, engine, K, count, rng):
+    # restoring the start state is left out of the timing
+    start = grid.copy()
+    topplings = seconds = 0
+    for i, j in random_sites(rng, grid.shape[0], count).tolist():
+        grid[i, j] += 1
+        t = time.perf_counter()
+        topplings += relax(grid, (i, j), K, engine)
+        seconds += time.perf_counter() - t
+        np.copyto(grid, start)
+    return topplings, seconds
+
+
+def _drive(grid, engine, K, count, rng):
+    t = time.perf_counter()
+    stats = simulate(grid, 'Random', count, rng, K, engine, AvalancheStats())
+    return stats.total, time.perf_counter() - t
+
+
+_WORKLOADS = {'topple': _topple, 'relax': _relax, 'single': _single, 'drive': _drive}
+
+
+def _exponent(workload, engine):
+    # how the time of a case grows with N, used to skip cases that would
+    # not fit the budget: relaxing the V state takes ~N^4 topplings, a full
+    # sweep ~N^2 work, and a random grain ~N^2 topplings on average (the
+    # sweep engine also scans the whole grid every sweep)
+    if workload == 'relax':
+        return 4
+    if workload in ('single', 'drive') and engine == 'sweep':
+        return 3
+    return 2
+
+
+def _compile():
+    # triggers numba compilation for both kernels so it is not timed
+    if kernels.AVAILABLE:
+        for dtype in (DTYPE, np.int64):
+            relax(initialize_grid(8, V).astype(dtype), engine='numba')
+
+
+def run_case(workload, engine, N, K=K, count=None, repeat=3, budget=60.0, seed=0):
+    # times one case: up to `repeat` runs (stopping early once budget seconds
+    # have passed) and one more run under tracemalloc for the peak memory.
+    # The engines' scratch storage is freed before that run, so the peak
+    # includes it; scratch_bytes is what it holds once the run is over
+    if count is None:
+        count = {'topple': 100, 'relax': 1, 'single': 1000, 'drive': 1000}[workload]
+    start, kind = (initialize_grid(N, V), 'uniform') if workload in ('topple', 'relax') else start_state(N, K)
+    run = _WORKLOADS[workload]
+    seconds, elapsed = [], 0.0
+    while len(seconds) < repeat and (not seconds or elapsed < budget):
+        topplings, t = run(start.copy(), engine, K, count, np.random.default_rng(seed))
+        seconds.append(t)
+        elapsed += t
+    grid = start.copy()
+    clear_buffers()
+    tracemalloc.start()
+    try:
+        run(grid, engine, K, count, np.random.default_rng(seed))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    scratch = clear_buffers()
+    best = min(seconds)
+    return {'workload': workload, 'engine': engine, 'N': N, 'K': K, 'count': count, 'start': kind,
+            'topplings': int(topplings), 'seconds': best, 'runs': len(seconds),
+            'topplings_per_s': topplings / best if best > 0 else 0.0,
+            'peak_bytes': int(peak), 'scratch_bytes': int(scratch), 'grid_bytes': int(start.nbytes)}
+
+
+def run_suite(sizes=SIZES, engines=None, workloads=WORKLOADS, K=K, counts=None, repeat=3,
+              budget=60.0, seed=0, log=None):
+    # runs every (workload, engine, N) case, smallest N first. A case whose
+    # time, extrapolated from the previous size, exceeds budget is reported
+    # as skipped instead of run. The topple workload times topple() itself
+    # and so runs once, under the 'sweep' engine
+    engines = sorted(ENGINES) if engines is None else list(engines)
+    _compile()
+    results = []
+    for workload in workloads:
+        for engine in engines:
+            if workload == 'topple' and engine != 'sweep':
+                continue
+            last = None
+            for N in sorted(sizes):
+                if last is not None:
+                    predicted = last['seconds'] * (N / last['N'])**_exponent(workload, engine)
+                    if predicted > budget:
+                        result = {'workload': workload, 'engine': engine, 'N': N, 'K': K,
+                                  'skipped': f'about {predicted:.0f} s per run exceeds the budget'}
+                        results.append(result)
+                        if log:
+                            log(result)
+                        continue  # larger sizes are predicted from the same run
+                result = run_case(workload, engine, N, K, (counts or {}).get(workload), repeat,
+                                  budget, seed)
+                results.append(result)
+                last = result
+                if log:
+                    log(result)
+    return results
+
+
+def _version(module):
+    try:
+        return __import__(module).__version__
+    except ImportError:
+        return None
+
+
+def environment():
+    # what the numbers were measured on
+    return {'python': sys.version.split()[0], 'numpy': np.__version__,
+            'numba': _version('numba'),
+            'platform': platform.platform(), 'processor': platform.processor(),
+            'cpus': os.cpu_count(), 'engine_version': ENGINE_VERSION,
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def save_results(path, results):
+    with open(path, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=1)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)['results']
+
+
+def compare(results, baseline, tolerance=0.2, min_bytes=1 << 20):
+    # the cases that got slower (topplings per second) or hungrier (peak
+    # memory) than the baseline by more than tolerance, as
+    # (result, baseline result, metric, ratio) tuples. Memory growth below
+    # min_bytes is ignored as noise; cases missing from either side, or
+    # skipped, are not compared
+    key = lambda r: (r['workload'], r['engine'], r['N'], r['K'], r.get('count'))
+    reference = {key(r): r for r in baseline if 'skipped' not in r}
+    regressions = []
+    for result in results:
+        base = reference.get(key(result))
+        if base is None or 'skipped' in result:
+            continue
+        if base['topplings_per_s'] > 0:
+            ratio = result['topplings_per_s'] / base['topplings_per_s']
+            if ratio < 1 - tolerance:
+                regressions.append((result, base, 'topplings_per_s', ratio))
+        if result['peak_bytes'] - base['peak_bytes'] > min_bytes:
+            ratio = result['peak_bytes'] / max(base['peak_bytes'], 1)
+            if ratio > 1 + tolerance:
+                regressions.append((result, base, 'peak_bytes', ratio))
+    return regressions
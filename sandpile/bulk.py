@@ -0,0 +1,152 @@
+import numpy as np
+
+from . import kernels
+from .engine import K, zero_boundary
+
+# Bulk relaxation of grids far from stable (a big pile on one site, a
+# uniform V state) through the odometer u, the number of times each cell
+# topples. By the least action principle u is the smallest v >= 0 with
+# h + lap(v) <= K on the interior: every engine ends at h + lap(u) after
+# sum(u) topplings, and any stabilizing v >= 0 is an upper bound of u.
+# With numba the odometer is guessed from the divisible sandpile (grains
+# split continuously, solved on a hierarchy of coarsened grids) and toppled
+# in one go; legal toppling then leaves a stabilizing odometer, and
+# topplings are taken back set by set (kernels.untopple) until none can be,
+# which leaves exactly u. The guess only decides the speed, never the
+# result. Without numba every unstable cell topples as often as it legally
+# can in each synchronous sweep, about h // 4 times
+
+
+def _density(K):
+    # the height the divisible guess spreads grains to: a little above the
+    # mean height of the relaxed pile (about 2.125 for K = 3), so the guess
+    # mostly stays below u and is finished by cheap legal toppling
+    return K - 0.6
+
+
+def _coarsen(h):
+    # sums the interior over 2 x 2 blocks, padding odd sizes with zeros
+    n, m = h.shape[0] - 2, h.shape[1] - 2
+    nc, mc = (n + 1) // 2, (m + 1) // 2
+    inner = np.zeros((2 * nc, 2 * mc))
+    inner[:n, :m] = h[1:-1, 1:-1]
+    coarse = np.zeros((nc + 2, mc + 2))
+    coarse[1:-1, 1:-1] = inner.reshape(nc, 2, mc, 2).sum(axis=(1, 3))
+    return coarse
+
+
+def _upsample(U, n, m):
+    # bilinear interpolation of the coarse interior onto n x m fine cells;
+    # fine cell i (from 1) sits at coarse coordinate (i + 0.5) / 2
+    def axis(size):
+        x = (np.arange(1, size + 1) + 0.5) / 2
+        low = np.floor(x).astype(np.int64)
+        return low, x - low
+    li, wi = axis(n)
+    lj, wj = axis(m)
+    wi, wj = wi[:, None], wj[None, :]
+    return ((U[li][:, lj] * (1 - wj) + U[li][:, lj + 1] * wj) * (1 - wi)
+            + (U[li + 1][:, lj] * (1 - wj) + U[li + 1][:, lj + 1] * wj) * wi)
+
+
+def divisible_odometer(h, density, sweeps=200, omega=1.5):
+    # approximate odometer of the divisible sandpile with heights h (zero
+    # boundary) that settles at the given density. Each level starts from
+    # the interpolated solution of the grid coarsened 2 x 2 (where a cell
+    # holds four times the density) and smooths it with `sweeps` projected
+    # SOR sweeps, twice as many on every coarser level
+    w = np.zeros(h.shape)
+    n, m = h.shape[0] - 2, h.shape[1] - 2
+    if min(n, m) > 16:
+        coarse = divisible_odometer(_coarsen(h), 4 * density, min(2 * sweeps, 2000), omega)
+        w[1:-1, 1:-1] = _upsample(coarse, n, m)
+        kernels.divisible_sweeps(w, h, density, omega, sweeps)
+    elif min(n, m) > 0:
+        kernels.divisible_sweeps(w, h, density, 1.8, 2000)
+    return w
+
+
+def _topple_all(work, v):
+    # topples every cell v times at once (v is zero on the boundary)
+    work[1:-1, 1:-1] -= 4 * v[1:-1, 1:-1]
+    work[:-2, 1:-1] += v[1:-1, 1:-1]
+    work[2:, 1:-1] += v[1:-1, 1:-1]
+    work[1:-1, :-2] += v[1:-1, 1:-1]
+    work[1:-1, 2:] += v[1:-1, 1:-1]
+
+
+def _untopple(work, odometer, K):
+    # lowers a stabilizing odometer to the least one. Sets are taken back k
+    # topplings at a time, doubling k after a success and halving it after
+    # a failure; the loop ends when not even one toppling can go
+    inset = np.zeros(work.shape, dtype=np.uint8)
+    outs = np.zeros(work.shape, dtype=np.int64)
+    queue = np.zeros(work.size, dtype=np.int64)
+    k = 1
+    while k:
+        if kernels.untopple(work, odometer, K, k, inset, outs, queue):
+            k *= 2
+        else:
+            k //= 2
+
+
+def _stabilize(work, odometer, K):
+    # relaxes the int64 grid in place with the compiled kernels, adding the
+    # topplings to odometer. The guess costs a few hundred sweeps over the
+    # grid and pays off when the excess grains (some E**2 topplings for a
+    # pile of E) outweigh that
+    interior = work[1:-1, 1:-1]
+    excess = float(np.clip(interior - K, 0, None).sum())
+    guessed = excess * excess > 100 * interior.size
+    if guessed:
+        guess = np.floor(divisible_odometer(work, _density(K))).astype(np.int64)
+        _topple_all(work, guess)
+        zero_boundary(work)
+        odometer += guess
+    N, M = work.shape
+    seeds = np.flatnonzero(work > K)
+    i, j = np.divmod(seeds, M)
+    seeds = seeds[(0 < i) & (i < N - 1) & (0 < j) & (j < M - 1)]
+    stack = np.zeros(work.size, dtype=np.int64)
+    stack[:seeds.size] = seeds
+    kernels.relax_odometer(work, stack, seeds.size, K, odometer)
+    if guessed:
+        zero_boundary(work)
+        _untopple(work, odometer, K)
+
+
+def _relax_synchronous(work, K, odometer):
+    # NumPy fallback: every unstable interior cell topples (h - K - 1) // 4 + 1
+    # times per sweep, which is legal since its neighbours only add grains
+    interior = work[1:-1, 1:-1]
+    counts = odometer[1:-1, 1:-1]
+    while True:
+        t = np.where(interior > K, (interior - K - 1) // 4 + 1, 0)
+        if not t.any():
+            return
+        counts += t
+        interior -= 4 * t
+        work[:-2, 1:-1] += t
+        work[2:, 1:-1] += t
+        work[1:-1, :-2] += t
+        work[1:-1, 2:] += t
+
+
+def relax_bulk(grid, site=None, K=K, odometer=None):
+    # relaxes the whole grid in place and returns the avalanche size; site
+    # is accepted for compatibility with the other engines. When odometer
+    # (an int64 array shaped like grid) is given, the topplings of every
+    # cell are added to it
+    work = grid.astype(np.int64)
+    zero_boundary(work)
+    counts = np.zeros(grid.shape, dtype=np.int64)
+    if min(grid.shape) >= 3:
+        if kernels.AVAILABLE:
+            _stabilize(work, counts, K)
+        else:
+            _relax_synchronous(work, K, counts)
+    zero_boundary(work)
+    grid[...] = work
+    if odometer is not None:
+        odometer += counts
+    return int(counts.sum())
@@ -0,0 +1,64 @@
+import os
+import tempfile
+
+import numpy as np
+
+from . import drive
+from .engine import ENGINE_VERSION, K, compact
+from .models import BOUNDARIES, Model
+
+V = drive.V
+
+
+def cache_dir():
+    # $SANDPILE_CACHE, or ~/.cache/sandpile
+    return os.environ.get('SANDPILE_CACHE') or os.path.join(os.path.expanduser('~'), '.cache', 'sandpile')
+
+
+def cached_array(name, compute, directory=None):
+    # loads <cache dir>/<name>, first computing and storing it on a miss. The
+    # file is written to a temporary name and renamed into place, and the
+    # returned array is memory-mapped copy-on-write: callers may modify it
+    # freely without touching the cached file
+    path = os.path.join(directory or cache_dir(), name)
+    if not os.path.exists(path):
+        array = compute()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, array)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    return np.load(path, mmap_mode='c')
+
+
+def _stable_name(N, V, K, boundary, lattice):
+    if boundary not in BOUNDARIES:
+        raise ValueError(f"unknown boundary {boundary!r}, expected one of {BOUNDARIES}")
+    # square-lattice names predate the other lattices
+    model = boundary if lattice == 'square' else f'{lattice}-{boundary}'
+    return f'stable-N{N}-K{K}-V{V}-{model}-v{ENGINE_VERSION}.npy'
+
+
+def is_cached(N, V=V, K=K, boundary='open', directory=None, lattice='square'):
+    # whether stable_state() would load the grid rather than compute it
+    return os.path.exists(os.path.join(directory or cache_dir(), _stable_name(N, V, K, boundary, lattice)))
+
+
+def stable_state(N, V=V, K=K, boundary='open', directory=None, lattice='square'):
+    # the stable grid reached by relaxing the uniform V state of the model
+    # (see models.py), computed once with the fastest engine and then loaded
+    # from the cache
+    name = _stable_name(N, V, K, boundary, lattice)
+    model = Model(lattice, K, boundary)
+    compute = (lambda: drive.stable_state(N, V, K)) if model.standard else (lambda: model.stable_state(N, V))
+    return cached_array(name, compute, directory)
+
+
+def load_grid(path):
+    # loads a grid saved with np.save, converting wider integer types (such as
+    # the int32 stable_starting_state.npy) to the compact dtype
+    return compact(np.load(path))
@@ -0,0 +1,137 @@
+import json
+import os
+import tempfile
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from .activity import ActivityMap
+from .drive import simulate
+from .engine import K
+from .eventlog import EventLog
+from .metrics import MetricsPublisher
+from .stats import AvalancheStats
+
+# the state of a driven run after `iteration` of its `num_avalanches` grains
+# (activity is None unless the run collected an ActivityMap)
+Checkpoint = namedtuple('Checkpoint', ['grid', 'rng', 'iteration', 'stats', 'strategy',
+                                       'num_avalanches', 'K', 'activity'])
+
+
+def history_dir(path):
+    # where the checkpoint at path keeps its ActivityMap's per-avalanche
+    # history
+    return os.path.splitext(path)[0] + '.history'
+
+
+def save_checkpoint(path, grid, rng, iteration, stats, strategy=None, num_avalanches=None, K=K,
+                    activity=None, activity_saved=0):
+    # writes a compressed checkpoint next to path and renames it into place,
+    # so an interruption never leaves a half-written file behind. Only the
+    # summed counts of an ActivityMap go into the checkpoint; its
+    # per-avalanche entries are appended to the files in history_dir(path),
+    # of which the first activity_saved avalanches are already written, so
+    # saving does not get slower as the run goes on. The history is written
+    # first and read back only up to the checkpoint's avalanche count
+    arrays = {f'stats_{key}': value for key, value in stats.state().items()}
+    if activity is not None:
+        activity.write_history(history_dir(path), activity_saved)
+        arrays.update({f'activity_{key}': value for key, value in activity.summary_state().items()})
+    meta = {
+        'rng': rng.bit_generator.state,
+        'iteration': int(iteration),
+        'strategy': strategy if isinstance(strategy, str) else None,
+        'num_avalanches': None if num_avalanches is None else int(num_avalanches),
+        'K': int(K),
+    }
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez_compressed(f, grid=grid, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def load_checkpoint(path):
+    with np.load(path) as data:
+        meta = json.loads(str(data['meta']))
+        stats = AvalancheStats.from_state(
+            {key[len('stats_'):]: data[key] for key in data.files if key.startswith('stats_')})
+        activity = {key[len('activity_'):]: data[key]
+                    for key in data.files if key.startswith('activity_')}
+        if not activity:
+            activity = None
+        elif 'cells' in activity:
+            activity = ActivityMap.from_state(activity)   # saved with the history inside
+        else:
+            activity = ActivityMap.read_history(activity, history_dir(path))
+        grid = data['grid']
+    state = meta['rng']
+    rng = np.random.Generator(getattr(np.random, state['bit_generator'])())
+    rng.bit_generator.state = state
+    return Checkpoint(grid, rng, meta['iteration'], stats, meta['strategy'],
+                      meta['num_avalanches'], meta['K'], activity)
+
+
+class Checkpointer:
+    # saves a running simulation to path at most every `every` seconds;
+    # iterations are counted from `start` so resumed runs keep their index.
+    # The run's ActivityMap, if any, is saved along, each save appending only
+    # the avalanches added since the one before
+
+    def __init__(self, path, every=10.0, start=0, strategy=None, num_avalanches=None, K=K,
+                 activity=None):
+        self.path = path
+        self.every = every
+        self.start = start
+        self.strategy = strategy
+        self.num_avalanches = num_avalanches
+        self.K = K
+        self.activity = activity
+        # avalanches of activity already in the history files: those of a
+        # resumed checkpoint, or none for a new run
+        self.saved = 0
+        if activity is not None and os.path.exists(history_dir(path)):
+            self.saved = activity.count
+        self.next_save = time.monotonic() + every
+
+    def due(self):
+        return time.monotonic() >= self.next_save
+
+    def save(self, grid, rng, n, stats):
+        save_checkpoint(self.path, grid, rng, self.start + n, stats,
+                        self.strategy, self.num_avalanches, self.K, self.activity, self.saved)
+        if self.activity is not None:
+            self.saved = self.activity.count
+        self.next_save = time.monotonic() + self.every
+
+
+def resume(path, strategy=None, engine='auto', every=10.0, events=None, observables=True,
+           metrics=None):
+    # continues the run saved at path until all of its grains are dropped and
+    # returns its statistics. The grid, RNG stream and statistics are restored
+    # exactly, so the result is identical to an uninterrupted run. events is
+    # the directory of the run's event log, which is cut back to the
+    # checkpoint and then appended to. A checkpointed ActivityMap carries on
+    # and ends up in the final checkpoint. With a metrics address the
+    # progress is published there (see metrics.py)
+    cp = load_checkpoint(path)
+    strategy = cp.strategy if strategy is None else strategy
+    if strategy is None:
+        raise ValueError(f"{path} does not name its drop strategy; pass strategy")
+    checkpointer = Checkpointer(path, every, cp.iteration, strategy, cp.num_avalanches, cp.K,
+                                cp.activity)
+    log = None if events is None else EventLog(events, observables, start=cp.iteration)
+    publisher = None if metrics is None else MetricsPublisher(cp.stats, metrics, cp.num_avalanches)
+    try:
+        return simulate(cp.grid, strategy, cp.num_avalanches - cp.iteration, cp.rng, cp.K, engine,
+                        cp.stats, checkpointer, events=log, activity=cp.activity)
+    finally:
+        if log is not None:
+            log.close()
+        if publisher is not None:
+            publisher.close()
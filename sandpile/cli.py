@@ -0,0 +1,466 @@
+# command-line entry point for the sandpile workflows:
+#
+#   python -m sandpile relax      relax the uniform V state (c.py, equilibrium_state.py)
+#   python -m sandpile drive      drop grains one by one (ICSsandpile.py, b.py, e.py)
+#   python -m sandpile examples   single-grain avalanches from the stable state (d.py)
+#   python -m sandpile ensemble   drop strategies side by side (f.py)
+#   python -m sandpile plot       redraw the figures of logged runs
+#   python -m sandpile watch      tail the live metrics of running simulations
+#   python -m sandpile bench      time the engines (see bench.py)
+#
+# Figures are written to --output (see report.py); nothing is shown on screen.
+import argparse
+import os
+import time
+
+import numpy as np
+
+from .activity import ActivityMap
+from .analysis import estimate
+from .cache import load_grid, stable_state
+from .checkpoint import Checkpointer, load_checkpoint
+from .drive import STRATEGIES, V, initialize_grid, random_site, simulate
+from .engine import ENGINES, K, relax_observed, relax_profiled
+from .ensemble import Job, job_name, run_ensemble
+from .eventlog import EventLog, events_stats
+from .green import require_scipy, validate
+from .metrics import MetricsPublisher, watch
+from .hooks import FrontierTrace, Hooks, Progress, SweepCounter, SweepTimer
+from .models import BOUNDARIES, LATTICES, Model
+from .observables import AvalancheRecord
+from .report import Reporter
+from .stats import AvalancheStats
+from .warmup import warm_up
+
+
+def _print_stats(stats):
+    print(f"Total avalanches: {stats.count}")
+    print(f"Minimum size: {stats.min}")
+    print(f"Maximum size: {stats.max}")
+    print(f"Average size: {stats.mean:.2f}")
+
+
+def _print_fit(args, stats):
+    # the maximum-likelihood exponent and cutoff asked for by --fit
+    if not args.fit or not stats.count:
+        return
+    e = estimate(stats, args.s_min, cutoff=not args.no_cutoff, resamples=args.resamples,
+                 seed=args.seed or 0)
+    ci = f"{e.level:.0%} CI"
+    print(f"Size exponent tau: {e.fit.tau:.4f} ({ci} {e.tau_ci[0]:.4f}..{e.tau_ci[1]:.4f}), "
+          f"sizes {e.fit.s_min}..{e.fit.s_max}, {e.fit.n} avalanches")
+    if not args.no_cutoff:
+        print(f"Size cutoff: {e.fit.cutoff:.4g} ({ci} {e.cutoff_ci[0]:.4g}..{e.cutoff_ci[1]:.4g})")
+
+
+def _report_sizes(report, stats, name, title):
+    report.size_distribution(stats, f'{name}_sizes', f'Avalanche Size Distribution ({title})')
+    report.size_histogram(stats, f'{name}_histogram', f'Avalanche Size Histogram ({title})',
+                          figsize=(10, 6), edgecolor='k', color='teal')
+
+
+def _hooks(args, sweeps):
+    # the hooks asked for by --progress (counting sweeps or avalanches) and
+    # --profile; returns (hooks or None, profile collectors)
+    if not args.progress and not args.profile:
+        return None, []
+    hooks = Hooks(every=args.sample)
+    if args.progress:
+        progress = Progress(args.progress)
+        if sweeps:
+            hooks.sweep_hooks.append(progress.sweep)
+        else:
+            hooks.avalanche_hooks.append(progress.avalanche)
+    collectors = []
+    if args.profile:
+        collectors = [hooks.add(collector) for collector in (SweepCounter(), SweepTimer(), FrontierTrace())]
+    return hooks, collectors
+
+
+def _print_profile(collectors):
+    for collector in collectors:
+        print(collector.summary())
+
+
+def _relax(args, grid, site=None, hooks=None, n=0):
+    # relaxes with the model of --lattice and --boundary
+    if args.model.standard:
+        return relax_profiled(grid, site, args.K, args.engine, hooks, n)
+    if hooks is not None:
+        raise ValueError(f"--progress and --profile need the standard model, not {args.model!r}")
+    return args.model.relax(grid, site, args.engine)
+
+
+def cmd_relax(args):
+    rng = np.random.default_rng(args.seed)
+    hooks, collectors = _hooks(args, sweeps=True)
+    grid = args.model.initialize(args.N, args.V)
+    initial_avalanche = _relax(args, grid, None, hooks)
+    print("Avalanche triggered during initial relaxation:", initial_avalanche)
+    with Reporter(args.output) as report:
+        report.grid(grid, f'{args.name}_equilibrium',
+                    f"Equilibrium State of the Sandpile\n(Initial state: zi,j = {args.V} for interior cells)",
+                    figsize=(6, 6), interpolation='nearest')
+        if args.add_grain:
+            # add one grain at a random interior location and relax again
+            i, j = random_site(rng, args.N)
+            grid[i, j] += 1
+            avalanche_after = _relax(args, grid, (i, j), hooks, 1)
+            print(f"Avalanche triggered after adding one grain at ({i}, {j}):", avalanche_after)
+            report.grid(grid, f'{args.name}_after_grain',
+                        "New Equilibrium State after a Single Grain Addition",
+                        figsize=(6, 6), interpolation='nearest')
+    _print_profile(collectors)
+    if args.save:
+        np.save(args.save, grid)
+
+
+def _start_grid(args):
+    if args.start == 'empty':
+        return initialize_grid(args.N, 0)
+    if args.start == 'uniform':
+        return args.model.initialize(args.N, args.V)
+    if args.start == 'stable':
+        return np.array(stable_state(args.N, args.V, args.K, args.boundary, lattice=args.lattice))
+    return load_grid(args.start)
+
+
+def _resume_drive(args):
+    # (grid, rng, stats, activity, grains done) of the --checkpoint to resume;
+    # it was written for the same number of grains and strategy
+    cp = load_checkpoint(args.checkpoint)
+    if (cp.num_avalanches, cp.strategy, cp.K) != (args.grains, args.strategy, args.K):
+        raise ValueError(f"{args.checkpoint} is a run of {cp.num_avalanches} grains ({cp.strategy}, "
+                         f"K={cp.K}), not {args.grains} ({args.strategy}, K={args.K})")
+    if args.activity is not None and cp.activity is None:
+        raise ValueError(f"{args.checkpoint} was saved without an activity map")
+    print(f"Resuming {args.checkpoint} after {cp.iteration} of {cp.num_avalanches} grains")
+    return cp.grid, cp.rng, cp.stats, cp.activity if args.activity is not None else None, cp.iteration
+
+
+def _prepare_drive(args, grid, rng):
+    # relaxes a uniform start and warms the grid up if asked to
+    if args.start == 'uniform':
+        # the uniform state is not stable; relax it before driving
+        initial_avalanche = _relax(args, grid)
+        print("Avalanche triggered during initial relaxation:", initial_avalanche)
+    if args.warmup:
+        warm = warm_up(grid, args.strategy, rng, args.K, args.warmup_batch, model=args.model)
+        last = warm.rounds[-1]
+        print(f"Warm-up: {len(warm.rounds)} rounds of {last.grains} grains, "
+              f"{sum(r.topplings for r in warm.rounds)} topplings, mean height {last.mean_height:.4f}, "
+              f"{last.lost / last.grains:.1%} of the last round lost"
+              + ("" if warm.recurrent is None else f", {'' if warm.recurrent else 'not '}recurrent")
+              + f", {'' if warm.stationary else 'not '}stationary")
+        if not warm.stationary:
+            print("Warning: the round limit was reached before the pile was stationary; "
+                  "a larger --warmup-batch needs fewer rounds")
+
+
+def _report_drive(args, grid, stats, record, activity, collectors):
+    N = grid.shape[0]
+    print("Simulation complete")
+    _print_stats(stats)
+    _print_fit(args, stats)
+    if record is not None and len(record):
+        print(f"Average area: {record['area'].mean():.2f} cells")
+        print(f"Average duration: {record['duration'].mean():.2f} sweeps")
+        print(f"Average radius: {record['radius'].mean():.2f}")
+        print(f"Grains lost at the boundary: {record['lost'].sum()}")
+    _print_profile(collectors)
+    with Reporter(args.output) as report:
+        _report_sizes(report, stats, args.name, f'N={N}, K={args.K}, {stats.count} avalanches')
+        report.grid(grid, f'{args.name}_grid', 'Final Sandpile Configuration')
+        if activity is not None:
+            report.grid(activity.total, f'{args.name}_activity', 'Topplings per Cell')
+    if activity is not None:
+        activity.save(args.activity)
+    if args.save:
+        np.save(args.save, grid)
+
+
+def cmd_drive(args):
+    hooks, collectors = _hooks(args, sweeps=False)
+    if args.checkpoint is not None and os.path.exists(args.checkpoint):
+        grid, rng, stats, activity, done = _resume_drive(args)
+        N = grid.shape[0]
+    else:
+        done = 0
+        rng = np.random.default_rng(args.seed)
+        grid = _start_grid(args)
+        N = grid.shape[0]
+        stats = AvalancheStats()
+        activity = None if args.activity is None else ActivityMap(grid.shape)
+        _prepare_drive(args, grid, rng)
+    # observables are recorded for the grains dropped by this process only
+    record = AvalancheRecord(args.grains - done) if args.observables else None
+    checkpointer = None
+    if args.checkpoint is not None:
+        checkpointer = Checkpointer(args.checkpoint, args.checkpoint_every, done, args.strategy,
+                                    args.grains, args.K, activity)
+    print(f"Dropping {args.grains - done} grains ({args.strategy}) on a {N}x{N} grid...")
+    events = None
+    if args.events is not None:
+        events = EventLog(args.events, args.observables, start=done if done else None)
+    publisher = None
+    if args.metrics is not None:
+        publisher = MetricsPublisher(stats, args.metrics, args.grains, args.name)
+    try:
+        simulate(grid, args.strategy, args.grains - done, rng, args.K, args.engine, stats,
+                 checkpointer, record=record, events=events, hooks=hooks, model=args.model,
+                 activity=activity)
+    finally:
+        if events is not None:
+            events.close()
+        if publisher is not None:
+            publisher.close()
+    _report_drive(args, grid, stats, record, activity, collectors)
+
+
+def cmd_examples(args):
+    rng = np.random.default_rng(args.seed)
+    stable_grid = stable_state(args.N, args.V, args.K, args.boundary, lattice=args.lattice)
+    final_grids, titles = [], []
+    activity = ActivityMap(stable_grid.shape)
+    recordings = []
+    if args.animate and not args.model.standard:
+        raise ValueError(f"--animate needs the standard model, not {args.model!r}")
+    for ex in range(args.examples):
+        grid = np.array(stable_grid)
+        i, j = random_site(rng, args.N)
+        grid[i, j] += 1
+        if args.animate:
+            from .frames import record_avalanche
+            avalanche_size, recording = record_avalanche(grid, (i, j), args.K)
+            sweeps = len(recording)
+            recordings.append(recording)
+        elif args.engine in ('sweep', 'tiled', 'bulk') or not args.model.standard:
+            avalanche_size, sweeps = _relax(args, grid, (i, j)), None
+        else:
+            observation = relax_observed(grid, (i, j), args.K, args.engine, activity=activity)
+            avalanche_size, sweeps = observation.size, observation.duration
+        print(f"Example {ex+1}: grain at ({i}, {j}), avalanche size {avalanche_size}"
+              + ("" if sweeps is None else f" after {sweeps} sweeps"))
+        final_grids.append(grid)
+        titles.append(f"Example {ex+1}\nGrain at ({i},{j}), Size={avalanche_size}")
+    with Reporter(args.output) as report:
+        report.grids(final_grids, f'{args.name}_examples', titles,
+                     figsize=(5 * args.examples, 5), interpolation='nearest')
+        if len(activity) == args.examples:
+            # where each avalanche went: how often every cell toppled
+            report.grids([activity.avalanche_map(n) for n in range(len(activity))],
+                         f'{args.name}_topplings', titles,
+                         figsize=(5 * args.examples, 5), interpolation='nearest')
+        for ex, recording in enumerate(recordings):
+            # the sweeps of each avalanche, kept as changed cells only
+            recording.save(os.path.join(args.output, f'{args.name}_example{ex+1}.npz'))
+            report.animation(recording, f'{args.name}_example{ex+1}', f"Example {ex+1}",
+                             every=args.every, interpolation='nearest')
+
+
+def cmd_ensemble(args):
+    start_time = time.time()
+    if args.validate:
+        # the prediction is computed after the runs; fail before them
+        try:
+            require_scipy()
+        except ImportError as error:
+            raise SystemExit(f"--validate: {error}") from None
+    seed = 0 if args.seed is None else args.seed
+    # job n uses seed + n
+    jobs = [Job(name, seed + n, args.N, args.grains) for n, name in enumerate(args.strategies)]
+    print(f"Simulating {args.grains} grains added at {', '.join(args.strategies)}...")
+    results = run_ensemble(jobs, args.workers, stats=True, checkpoint_dir=args.checkpoints,
+                           events_dir=args.events, K=args.K, engine=args.engine,
+                           activity_dir=args.activity, metrics_dir=args.metrics, warmup=args.warmup)
+    with Reporter(args.output) as report:
+        for job, name, stats in zip(jobs, args.strategies, results):
+            print(f"\nAvalanche size statistics ({name}):")
+            _print_stats(stats)
+            _print_fit(args, stats)
+            if args.validate:
+                check = validate(stats, args.N, name)
+                print(f"Predicted average size: {check.predicted:.2f} (simulated {check.simulated:.2f} "
+                      f"+- {check.stderr:.2f}, relative error {check.rel_error:.1%}, "
+                      f"{'ok' if check.ok else 'MISMATCH'})")
+            _report_sizes(report, stats, f'{args.name}_{name}',
+                          f'{name}, N={args.N}, K={args.K}, {stats.count} avalanches')
+            if args.activity:
+                activity = ActivityMap.load(os.path.join(args.activity, job_name(job) + '.activity.npz'))
+                report.grid(activity.total, f'{args.name}_{name}_activity',
+                            f'Topplings per Cell ({name})')
+    print(f'\nScript ran for {(time.time() - start_time)/60:.2f} min')
+
+
+def cmd_plot(args):
+    with Reporter(args.output) as report:
+        for path in args.logs:
+            stats = events_stats(path)
+            name = os.path.splitext(os.path.basename(os.path.normpath(path)))[0]
+            print(f"{path}:")
+            _print_stats(stats)
+            _print_fit(args, stats)
+            _report_sizes(report, stats, name, f'{name}, {stats.count} avalanches')
+
+
+def cmd_watch(args):
+    watch(args.addresses, retry=args.retry)
+
+
+def _log_case(result):
+    case = f"{result['workload']:>6} {result['engine']:>8} N={result['N']:<5}"
+    if 'skipped' in result:
+        print(f"{case} skipped: {result['skipped']}")
+    else:
+        print(f"{case} {result['topplings_per_s']:12.4g} topplings/s  {result['seconds']:9.4f} s"
+              f"  peak {result['peak_bytes'] / 2**20:8.2f} MiB  ({result['start']} start)")
+
+
+def cmd_bench(args):
+    from . import bench
+    counts = {'topple': args.sweeps, 'single': args.grains, 'drive': args.grains}
+    results = bench.run_suite(args.sizes, args.engines, args.workloads, args.K, counts, args.repeat,
+                              args.budget, args.seed or 0, log=_log_case)
+    if args.json:
+        bench.save_results(args.json, results)
+    if args.baseline:
+        regressions = bench.compare(results, bench.load_results(args.baseline), args.tolerance)
+        for result, base, metric, ratio in regressions:
+            print(f"REGRESSION {result['workload']} {result['engine']} N={result['N']}: "
+                  f"{metric} {base[metric]:.4g} -> {result[metric]:.4g} ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print(f"no regressions against {args.baseline}")
+
+
+def parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--N', type=int, default=200, help="grid size (default 200)")
+    common.add_argument('--K', type=int, default=None,
+                        help="slope at critical point (default 3, or neighbours - 1 on other lattices)")
+    common.add_argument('--V', type=int, default=V, help="initial slope of interior cells (default 7)")
+    common.add_argument('--engine', default='auto', choices=['auto'] + sorted(ENGINES),
+                        help="relaxation engine (default: fastest available)")
+    common.add_argument('--seed', type=int, default=None, help="seed of the grain placement RNG")
+    common.add_argument('--output', default='figures', help="directory for the figures")
+    common.add_argument('--name', default='sandpile', help="prefix of the figure file names")
+
+    profiling = argparse.ArgumentParser(add_help=False)
+    profiling.add_argument('--progress', type=int, default=0, metavar='EVERY',
+                           help="print a line every EVERY sweeps (relax) or avalanches (drive)")
+    profiling.add_argument('--profile', action='store_true',
+                           help="report sweeps per avalanche, time per sweep and frontier sizes")
+    profiling.add_argument('--sample', type=int, default=1, metavar='EVERY',
+                           help="pass only every EVERY-th sweep to the sweep hooks (default 1)")
+
+    modelling = argparse.ArgumentParser(add_help=False)
+    modelling.add_argument('--lattice', default='square', choices=sorted(LATTICES),
+                           help="neighbours of a cell (default square; see models.py)")
+    modelling.add_argument('--boundary', default='open', choices=BOUNDARIES,
+                           help="left and right edges: open, closed or periodic (default open)")
+
+    fitting = argparse.ArgumentParser(add_help=False)
+    fitting.add_argument('--fit', action='store_true',
+                         help="estimate the size exponent and cutoff by maximum likelihood "
+                              "(see analysis.py)")
+    fitting.add_argument('--s-min', type=int, default=1, help="smallest size fitted (default 1)")
+    fitting.add_argument('--no-cutoff', action='store_true', help="fit a pure power law")
+    fitting.add_argument('--resamples', type=int, default=200,
+                         help="bootstrap resamples for the confidence intervals, 0 for none (default 200)")
+
+    p = argparse.ArgumentParser(prog='python -m sandpile', description="Abelian sandpile simulations")
+    commands = p.add_subparsers(dest='command', required=True)
+
+    c = commands.add_parser('relax', parents=[common, modelling, profiling], help="relax the uniform V state")
+    c.add_argument('--add-grain', action='store_true', help="then add one grain and relax again")
+    c.add_argument('--save', help="save the final grid to this .npy file")
+    c.set_defaults(run=cmd_relax)
+
+    c = commands.add_parser('drive', parents=[common, modelling, profiling, fitting],
+                            help="drop grains one by one")
+    c.add_argument('--start', default='stable',
+                   help="empty, uniform (all V), stable (relaxed from V) or a .npy file (default stable)")
+    c.add_argument('--grains', type=int, default=5000, help="number of grains to add (default 5000)")
+    c.add_argument('--warmup', action='store_true',
+                   help="first drop grains in bulk rounds until the pile is stationary (see warmup.py)")
+    c.add_argument('--warmup-batch', type=int, default=None, metavar='GRAINS',
+                   help="grains per warm-up round (default: one per interior cell)")
+    c.add_argument('--strategy', default='Random', choices=sorted(STRATEGIES))
+    c.add_argument('--observables', action='store_true',
+                   help="record area, duration, radius and lost grains of every avalanche")
+    c.add_argument('--events', help="log every avalanche to this event log directory (replaced on every run)")
+    c.add_argument('--activity', help="save per-cell toppling counts to this .npz file (see activity.py)")
+    c.add_argument('--metrics', metavar='ADDRESS',
+                   help="publish live progress on this Unix socket or localhost host:port (see metrics.py)")
+    c.add_argument('--checkpoint', metavar='FILE',
+                   help="save the run to this .npz file as it goes and resume from it if it exists")
+    c.add_argument('--checkpoint-every', type=float, default=10.0, metavar='SECONDS',
+                   help="seconds between checkpoints (default 10)")
+    c.add_argument('--save', help="save the final grid to this .npy file")
+    c.set_defaults(run=cmd_drive)
+
+    c = commands.add_parser('examples', parents=[common, modelling],
+                            help="single-grain avalanches from the stable state")
+    c.add_argument('--examples', type=int, default=3, help="number of examples (default 3)")
+    c.add_argument('--animate', action='store_true',
+                   help="record every avalanche sweep by sweep and write it as an animated GIF")
+    c.add_argument('--every', type=int, default=1, metavar='SWEEPS',
+                   help="with --animate, draw every SWEEPS-th sweep (default 1)")
+    c.set_defaults(run=cmd_examples)
+
+    c = commands.add_parser('ensemble', parents=[common, fitting], help="run drop strategies side by side")
+    c.add_argument('--strategies', nargs='+', default=['Random', 'Middle', 'Edges'],
+                   choices=sorted(STRATEGIES))
+    c.add_argument('--grains', type=int, default=20000, help="grains per strategy (default 20000)")
+    c.add_argument('--workers', type=int, default=None, help="processes (default: one per strategy)")
+    c.add_argument('--checkpoints', help="checkpoint directory; interrupted runs resume from it")
+    c.add_argument('--events', help="directory for one event log per strategy")
+    c.add_argument('--activity', help="directory for the per-cell toppling counts of each strategy")
+    c.add_argument('--warmup', action='store_true',
+                   help="start every strategy from its stationary state (see warmup.py)")
+    c.add_argument('--metrics', metavar='DIR',
+                   help="directory for one live progress socket per strategy (see `watch`)")
+    c.add_argument('--validate', action='store_true',
+                   help="compare mean sizes with the Green's-function prediction (needs scipy)")
+    c.set_defaults(run=cmd_ensemble)
+
+    c = commands.add_parser('plot', parents=[common, fitting], help="redraw the figures of logged runs")
+    c.add_argument('logs', nargs='+', help="event log directories")
+    c.set_defaults(run=cmd_plot)
+
+    c = commands.add_parser('watch', help="tail the live metrics of running simulations")
+    c.add_argument('addresses', nargs='+',
+                   help="Unix sockets, localhost host:port or directories of sockets (ensemble --metrics)")
+    c.add_argument('--retry', type=float, default=30.0,
+                   help="seconds to wait for a simulation to come up (default 30)")
+    c.set_defaults(run=cmd_watch)
+
+    c = commands.add_parser('bench', help="time the engines and flag regressions")
+    c.add_argument('--sizes', type=int, nargs='+', default=[50, 200, 1024, 4096])
+    c.add_argument('--engines', nargs='+', default=sorted(ENGINES), choices=sorted(ENGINES))
+    c.add_argument('--workloads', nargs='+', default=['topple', 'relax', 'single', 'drive'],
+                   choices=['topple', 'relax', 'single', 'drive'])
+    c.add_argument('--K', type=int, default=K, help="slope at critical point (default 3)")
+    c.add_argument('--sweeps', type=int, default=100, help="sweeps of the topple workload (default 100)")
+    c.add_argument('--grains', type=int, default=1000,
+                   help="grains of the single and drive workloads (default 1000)")
+    c.add_argument('--repeat', type=int, default=3, help="timed runs per case, best is kept (default 3)")
+    c.add_argument('--budget', type=float, default=60.0,
+                   help="seconds per run above which larger grids are skipped (default 60)")
+    c.add_argument('--seed', type=int, default=0, help="seed of the grain placement RNG")
+    c.add_argument('--json', help="write the results to this file")
+    c.add_argument('--baseline', help="results file to compare with; exit status 1 on a regression")
+    c.add_argument('--tolerance', type=float, default=0.2,
+                   help="allowed relative slowdown or memory growth (default 0.2)")
+    c.set_defaults(run=cmd_bench)
+    return p
+
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    if hasattr(args, 'lattice'):
+        args.model = Model(args.lattice, args.K, args.boundary)
+        args.K = args.model.K
+    elif hasattr(args, 'K') and args.K is None:
+        args.K = K
+    return args.run(args) or 0
@@ -0,0 +1,168 @@
+import numpy as np
+
+from .engine import DTYPE, K, relax, relax_observed, relax_profiled
+
+V = 7            # initial slope of interior cells
+
+
+def initialize_grid(N, V=V):
+    # a grid with boundaries fixed at 0 and interior cells set to V
+    grid = np.zeros((N, N), dtype=DTYPE)
+    grid[1:-1, 1:-1] = V
+    return grid
+
+
+def stable_state(N, V=V, K=K, engine='auto'):
+    # the stable grid reached by relaxing the uniform V state; for N=200 this
+    # is the grid stored in stable_starting_state.npy
+    grid = initialize_grid(N, V)
+    relax(grid, K=K, engine=engine)
+    return grid
+
+
+# drop strategies: each takes a numpy Generator, the grid size and a count
+# and returns a (count, 2) array with the cells that receive the next
+# grains. Every coordinate costs exactly one draw from the generator, so the
+# sites depend only on the stream and on how many grains came before it,
+# not on the block sizes they were drawn in
+
+def _uniform(rng, low, high, size):
+    # integers in [low, high), one double each (biased by at most (high - low) / 2**53)
+    return low + (rng.random(size) * (high - low)).astype(np.int64)
+
+
+def random_sites(rng, N, count):
+    # any interior cell
+    return _uniform(rng, 1, N-1, (count, 2))
+
+
+def middle_sites(rng, N, count):
+    # always the centre of the grid
+    return np.full((count, 2), N // 2, dtype=np.int64)
+
+
+def _edge_bands(N):
+    # row and column ranges of the bands used by edge_sites
+    return (
+        (1, 11, 1, N),        # top
+        (N-10, N, 1, N),      # bottom
+        (1, N, 1, 11),        # left
+        (1, N, N-10, N),      # right
+    )
+
+
+def edge_sites(rng, N, count):
+    # a cell in a band of 10 rows/columns along a randomly chosen border
+    bands = np.array(_edge_bands(N))
+    u = rng.random((count, 3))
+    i0, i1, j0, j1 = bands[(u[:, 0] * len(bands)).astype(np.int64)].T
+    return np.stack([i0 + (u[:, 1] * (i1 - i0)).astype(np.int64),
+                     j0 + (u[:, 2] * (j1 - j0)).astype(np.int64)], axis=1)
+
+
+def random_site(rng, N):
+    # a single random_sites() draw
+    return random_sites(rng, N, 1)[0]
+
+
+STRATEGIES = {
+    'Random': random_sites,
+    'Middle': middle_sites,
+    'Edges': edge_sites,
+}
+
+
+def site_streams(seed, count):
+    # count independent Generators spawned from one seed, e.g. one per
+    # replica of simulate_batch() or per worker
+    return [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(count)]
+
+
+def batch_sites(strategy, rngs, N, count):
+    # the next count drop sites of every stream, as the (count, B, 2) array
+    # simulate_batch() takes. Replica b gets the same sites as a simulate()
+    # run with rngs[b]
+    drop = STRATEGIES[strategy] if isinstance(strategy, str) else strategy
+    return np.stack([drop(rng, N, count) for rng in rngs], axis=1)
+
+
+def site_distribution(strategy, N):
+    # probability of each cell of an N x N grid receiving the next grain under
+    # one of the named strategies
+    p = np.zeros((N, N))
+    if strategy == 'Random':
+        p[1:-1, 1:-1] = 1 / (N-2)**2
+    elif strategy == 'Middle':
+        p[N // 2, N // 2] = 1
+    elif strategy == 'Edges':
+        for i0, i1, j0, j1 in _edge_bands(N):
+            p[i0:i1, j0:j1] += 1 / (len(_edge_bands(N)) * (i1 - i0) * (j1 - j0))
+    else:
+        raise ValueError(f"unknown strategy {strategy!r}, expected one of {sorted(STRATEGIES)}")
+    return p
+
+
+def simulate(grid, strategy, num_avalanches, rng, K=K, engine='auto', stats=None,
+             checkpointer=None, record=None, events=None, hooks=None, block=4096, model=None,
+             activity=None):
+    # drops num_avalanches grains on grid (in place) at the sites chosen by
+    # strategy (a name from STRATEGIES or a function like them), drawn from
+    # rng in blocks of up to `block` grains, and returns the avalanche size
+    # of each one. When a stats
+    # collector is given the sizes are fed to it instead of being stored, so
+    # memory does not grow with the run, and the collector is returned.
+    # A checkpointer (see checkpoint.py) periodically saves grid, RNG and
+    # statistics so the run can be resumed; it needs a stats collector and is
+    # only consulted between blocks, where rng has drawn no unused sites.
+    # With an AvalancheRecord (see observables.py) the area, duration, radius
+    # and lost grains of every avalanche are recorded in the same pass, and an
+    # EventLog (see eventlog.py) gets the drop site and size or observables.
+    # hooks (see hooks.py) are told about every avalanche and sampled sweep,
+    # and an ActivityMap (see activity.py) collects per-cell toppling counts.
+    # A Model (see models.py) other than the standard one replaces K and
+    # relaxes on its own kernel, without observables, activity maps or hooks
+    if checkpointer is not None and stats is None:
+        raise ValueError("checkpointing needs a stats collector")
+    drop = STRATEGIES[strategy] if isinstance(strategy, str) else strategy
+    observe = (record is not None or activity is not None
+               or (events is not None and events.observables))
+    if model is not None:
+        K = model.K
+        if model.standard:
+            model = None
+        elif observe or hooks is not None:
+            raise ValueError(f"observables, activity maps and hooks need the standard model, not {model!r}")
+    N = grid.shape[0]
+    avalanche_sizes = np.zeros(num_avalanches, dtype=np.int64) if stats is None else None
+    for first in range(0, num_avalanches, block):
+        sites = drop(rng, N, min(block, num_avalanches - first)).tolist()
+        for n, (i, j) in enumerate(sites, first):
+            grid[i, j] += 1
+            if observe:
+                observation = relax_observed(grid, (i, j), K, engine, hooks, n, activity)
+                size = observation.size
+                if record is not None:
+                    record.append(observation)
+                if events is not None:
+                    events.append(i, j, *observation)
+            elif model is not None:
+                size = model.relax(grid, (i, j), engine)
+                if events is not None:
+                    events.append(i, j, size)
+            else:
+                size = relax_profiled(grid, (i, j), K, engine, hooks, n)
+                if events is not None:
+                    events.append(i, j, size)
+            if stats is None:
+                avalanche_sizes[n] = size
+            else:
+                stats.add(size)
+        if checkpointer is not None and checkpointer.due():
+            if events is not None:
+                events.flush()  # the log must hold every checkpointed event
+            checkpointer.save(grid, rng, first + len(sites), stats)
+    if events is not None:
+        events.flush()
+    if checkpointer is not None:
+        checkpointer.save(grid, rng, num_avalanches, stats)
+    return avalanche_sizes if stats is None else stats
@@ -0,0 +1,419 @@
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from . import kernels
+
+K = 3            # slope at critical point
+
+# bumped whenever a change to the engines alters relaxed grids, so cached
+# results computed by older versions are not reused
+ENGINE_VERSION = 2
+
+# grids are stored one byte per cell. During synchronous relaxation heights
+# never exceed max(initial, K + 4), so any stable state plus grains fits
+DTYPE = np.uint8
+
+
+def compact(grid, dtype=DTYPE):
+    # converts a grid of any integer type (e.g. an int64 .npy file written by
+    # an older version) to the compact dtype, refusing heights that do not fit
+    info = np.iinfo(dtype)
+    if grid.size and (grid.min() < info.min or grid.max() > info.max):
+        raise ValueError(f"grid heights {grid.min()}..{grid.max()} do not fit in {np.dtype(dtype)}")
+    return np.asarray(grid).astype(dtype)
+
+
+def zero_boundary(grid):
+    # boundaries remain fixed at 0 (also for a stack of grids)
+    grid[..., 0, :] = 0
+    grid[..., -1, :] = 0
+    grid[..., :, 0] = 0
+    grid[..., :, -1] = 0
+
+
+def topple(grid, K=K):
+    # performs one synchronous update of the grid in place, using whole-array
+    # operations instead of a per-cell loop over the interior
+    interior = grid[1:-1, 1:-1]
+    unstable = interior > K
+    topple_count = int(np.count_nonzero(unstable))
+    if topple_count:
+        u = unstable.astype(grid.dtype)
+        interior -= 4 * u
+        grid[2:, 1:-1] += u
+        grid[:-2, 1:-1] += u
+        grid[1:-1, 2:] += u
+        grid[1:-1, :-2] += u
+    zero_boundary(grid)
+    return topple_count  # number of topplings that occurred
+
+
+def run_avalanche(grid, K=K):
+    # runs the avalanche until no cell is unstable
+    avalanche_size = 0
+    while True:
+        count = topple(grid, K)
+        if count == 0:
+            break
+        avalanche_size += count
+    return avalanche_size  # total number of topplings during the avalanche
+
+
+def _unstable(flat, cells, shape, K):
+    # the interior cells among `cells` that are above K
+    N, M = shape
+    i, j = np.divmod(cells, M)
+    keep = (i >= 1) & (i < N - 1) & (j >= 1) & (j < M - 1)
+    cells = cells[keep]
+    return cells[flat[cells] > K]
+
+
+# what one avalanche did, as recorded by relax_observed(): total topplings,
+# distinct cells toppled, synchronous sweeps, largest distance of a toppled
+# cell from the drop site and grains lost through the boundary
+Observation = namedtuple('Observation', ['size', 'area', 'duration', 'radius', 'lost'])
+
+
+def _frontier(grid, site, K, observe, on_sweep=None, odometer=None, seeds=None, slot=None):
+    # the NumPy frontier relaxation behind relax_frontier(), relax_observed()
+    # and relax_profiled(); returns (avalanche_size, toppled cells, duration,
+    # lost). on_sweep(frontier size, seconds) is called after every sweep,
+    # and every toppling adds one at its cell of the flat odometer if given.
+    # seeds (distinct flat indices) replace the site as the cells the
+    # relaxation starts from. slot is scratch storage of grid.size int64
+    # entries; the shared buffer is used when none is given, so callers
+    # running at the same time in several threads must each pass their own
+    N, M = grid.shape
+    flat = grid.reshape(-1)
+    if seeds is not None:
+        frontier = seeds
+    elif site is None:
+        frontier = np.flatnonzero(flat > K)
+    else:
+        frontier = np.array([site[0] * M + site[1]])
+    frontier = _unstable(flat, frontier, grid.shape, K)
+    offsets = (M, -M, 1, -1)
+    if slot is None:
+        slot = _buffer('slot', grid.size)
+    inside = _interior(grid.shape)
+    avalanche_size = duration = lost = 0
+    toppled = []
+    while frontier.size:
+        if on_sweep is not None:
+            start, size = time.perf_counter(), frontier.size
+        avalanche_size += frontier.size
+        duration += 1
+        neighbours = [frontier + off for off in offsets]
+        flat[frontier] -= 4
+        if odometer is not None:
+            odometer[frontier] += 1
+        for cells in neighbours:
+            flat[cells] += 1
+        if observe:
+            toppled.append(frontier)
+            i, j = np.divmod(frontier, M)
+            lost += int(np.count_nonzero(i == 1) + np.count_nonzero(i == N - 2)
+                        + np.count_nonzero(j == 1) + np.count_nonzero(j == M - 2))
+        # only toppled cells and their neighbours can be unstable next sweep;
+        # a cell that is a candidate more than once keeps only the position
+        # whose index survives in the scratch slot array
+        candidates = np.concatenate([frontier] + neighbours)
+        candidates = candidates[flat[candidates] > K]
+        candidates = candidates[inside[candidates]]
+        order = np.arange(candidates.size)
+        slot[candidates] = order
+        frontier = candidates[slot[candidates] == order]
+        if on_sweep is not None:
+            on_sweep(size, time.perf_counter() - start)
+    cells = np.unique(np.concatenate(toppled)) if toppled else np.zeros(0, dtype=np.int64)
+    return avalanche_size, cells, duration, lost
+
+
+def relax_frontier(grid, site=None, K=K):
+    # relaxes the grid in place by tracking only the cells that can be
+    # unstable: the frontier starts at the added grain and grows as
+    # neighbours cross K. The whole frontier topples at once, so each step is
+    # one synchronous sweep and the cost scales with the avalanche rather
+    # than with N*N. Without a site most of the grid is usually unstable, and
+    # whole-array sweeps (run_avalanche) are much faster than indexing it
+    if site is None:
+        return run_avalanche(grid, K)
+    if not grid.flags.c_contiguous:
+        work = np.ascontiguousarray(grid)
+        avalanche_size = relax_frontier(work, site, K)
+        grid[...] = work
+        return avalanche_size
+    avalanche_size = _frontier(grid, site, K, False)[0]
+    zero_boundary(grid)
+    return avalanche_size
+
+
+# scratch storage for the engines by (name, size), reused between
+# avalanches
+_buffers = {}
+
+
+def _buffer(name, size):
+    buffer = _buffers.get((name, size))
+    if buffer is None:
+        dtype = np.uint8 if name in ('mark', 'visited') else np.int64
+        buffer = _buffers[name, size] = np.zeros(size, dtype=dtype)
+    return buffer
+
+
+def _interior(shape):
+    # flat mask of the interior cells of a grid of this shape, kept with the
+    # scratch storage
+    inside = _buffers.get(('interior', shape))
+    if inside is None:
+        inside = np.zeros(shape, dtype=bool)
+        inside[1:-1, 1:-1] = True
+        inside = _buffers['interior', shape] = inside.reshape(-1)
+    return inside
+
+
+def clear_buffers():
+    # frees the kernels' scratch storage; returns the number of bytes it held
+    held = sum(buffer.nbytes for buffer in _buffers.values())
+    _buffers.clear()
+    return held
+
+
+def _seed(grid, site, K):
+    # puts the initially unstable cells on the kernel worklist
+    N, M = grid.shape
+    stack = _buffer('stack', grid.size)
+    if site is None:
+        seeds = _unstable(grid.reshape(-1), np.flatnonzero(grid > K), grid.shape, K)
+        n = seeds.size
+        stack[:n] = seeds
+    else:
+        i, j = site
+        n = int(0 < i < N - 1 and 0 < j < M - 1 and grid[i, j] > K)
+        stack[0] = i * M + j
+    return stack, n
+
+
+def _frontier_kernel(grid, stack, n, K, observe, trace=None, odometer=None):
+    following, mark = _buffer('following', grid.size), _buffer('mark', grid.size)
+    if observe:
+        visited, touched = _buffer('visited', grid.size), _buffer('touched', grid.size)
+    else:
+        visited = touched = _buffer('stack', 1)
+    if trace is None:
+        trace = _buffer('trace', 0)
+    if odometer is None:
+        odometer = _buffer('odometer', 0)
+    return kernels.relax_frontier(grid, stack, n, following, mark, K, observe, visited, touched,
+                                  trace, odometer)
+
+
+def _sampler(hooks, n):
+    # the on_sweep callback of the NumPy engines, passing every
+    # hooks.every-th sweep of avalanche n on to the sweep hooks; None when
+    # there are none
+    if hooks is None or not hooks.sweep_hooks:
+        return None
+    count = 0
+
+    def on_sweep(frontier, seconds):
+        nonlocal count
+        count += 1
+        if count % hooks.every == 0:
+            hooks.sweep(n, count, frontier, seconds)
+    return on_sweep
+
+
+def _trace(grid, hooks):
+    # where the compiled kernel records frontier sizes for the sweep hooks
+    return _buffer('trace', grid.size if hooks is not None and hooks.sweep_hooks else 0)
+
+
+def _replay(hooks, n, trace, duration):
+    # passes the frontier sizes recorded by the compiled kernel to the sweep
+    # hooks once the avalanche is over. The kernel does not time single
+    # sweeps, so seconds is None
+    for sweep in range(hooks.every, min(duration, trace.size) + 1, hooks.every):
+        hooks.sweep(n, sweep, int(trace[sweep - 1]), None)
+
+
+def relax_compiled(grid, site=None, K=K):
+    # relaxes the grid in place with a compiled kernel and no per-sweep
+    # allocation. Wide grids use the stack kernel, which topples each cell
+    # straight back to stability; one- and two-byte grids use the
+    # frontier kernel, whose heights provably stay within the dtype
+    if not kernels.AVAILABLE:
+        raise RuntimeError("the 'numba' engine needs numba to be installed")
+    if not grid.flags.c_contiguous:
+        work = np.ascontiguousarray(grid)
+        avalanche_size = relax_compiled(work, site, K)
+        grid[...] = work
+        return avalanche_size
+    stack, n = _seed(grid, site, K)
+    avalanche_size = 0
+    if n and grid.dtype.itemsize >= 4:
+        avalanche_size = int(kernels.relax_stack(grid, stack, n, K))
+    elif n:
+        avalanche_size = int(_frontier_kernel(grid, stack, n, K, False)[0])
+    zero_boundary(grid)
+    return avalanche_size
+
+
+def relax_observed(grid, site=None, K=K, engine='auto', hooks=None, n=0, activity=None):
+    # relaxes the grid in place like relax() and records the avalanche's
+    # observables in the same pass. Both the compiled ('numba') and the
+    # NumPy ('frontier') engines count synchronous sweeps, so the duration
+    # is the number of sweeps the full-grid engine would need. hooks are
+    # called as in relax_profiled(), and an ActivityMap (see activity.py)
+    # gets the number of topplings of every toppled cell
+    if engine == 'auto':
+        engine = 'numba' if kernels.AVAILABLE else 'frontier'
+    if engine not in ('numba', 'frontier'):
+        raise ValueError(f"engine {engine!r} does not record observables, use 'numba' or 'frontier'")
+    if engine == 'numba' and not kernels.AVAILABLE:
+        raise RuntimeError("the 'numba' engine needs numba to be installed")
+    if not grid.flags.c_contiguous:
+        work = np.ascontiguousarray(grid)
+        observation = relax_observed(work, site, K, engine, hooks, n, activity)
+        grid[...] = work
+        return observation
+    N, M = grid.shape
+    odometer = None
+    if activity is not None:
+        if activity.shape != grid.shape:
+            raise ValueError(f"activity map of shape {activity.shape} for a grid of shape {grid.shape}")
+        odometer = activity.odometer
+    start = time.perf_counter()
+    if engine == 'numba':
+        stack, m = _seed(grid, site, K)
+        trace = _trace(grid, hooks)
+        avalanche_size = area = duration = lost = 0
+        if m:
+            avalanche_size, area, duration, lost = _frontier_kernel(grid, stack, m, K, True, trace,
+                                                                    odometer)
+        cells = _buffer('touched', grid.size)[:area]
+    else:
+        avalanche_size, cells, duration, lost = _frontier(grid, site, K, True, _sampler(hooks, n),
+                                                          odometer)
+    seconds = time.perf_counter() - start
+    if activity is not None:
+        activity.add(cells)
+    radius = 0.0
+    if site is not None:
+        i, j = site
+        if cells.size:
+            ci, cj = np.divmod(cells, M)
+            radius = float(np.sqrt(((ci - i)**2 + (cj - j)**2).max()))
+        if not (0 < i < N - 1 and 0 < j < M - 1):
+            lost += int(grid[i, j])  # the grain itself was dropped on the boundary
+    zero_boundary(grid)
+    if hooks is not None:
+        if engine == 'numba' and hooks.sweep_hooks:
+            _replay(hooks, n, trace, duration)
+        hooks.avalanche(n, site, int(avalanche_size), int(duration), seconds)
+    return Observation(int(avalanche_size), int(cells.size), int(duration), radius, int(lost))
+
+
+def _relax_sweep(grid, site=None, K=K):
+    return run_avalanche(grid, K)
+
+
+def _relax_tiled(grid, site=None, K=K):
+    from .tiled import relax_tiled  # tiled.py builds on this module
+    return relax_tiled(grid, site, K)
+
+
+def _relax_bulk(grid, site=None, K=K):
+    from .bulk import relax_bulk  # bulk.py builds on this module
+    return relax_bulk(grid, site, K)
+
+
+# relaxation engines by name; all give the same avalanche size and final grid
+ENGINES = {
+    'sweep': _relax_sweep,
+    'frontier': relax_frontier,
+    'tiled': _relax_tiled,
+    'bulk': _relax_bulk,
+}
+if kernels.AVAILABLE:
+    ENGINES['numba'] = relax_compiled
+
+# fastest engine available in this environment
+DEFAULT_ENGINE = 'numba' if kernels.AVAILABLE else 'frontier'
+
+
+def _auto(site):
+    # the engine 'auto' stands for: without numba, whole-grid relaxations
+    # (no site) run on full-grid sweeps
+    return DEFAULT_ENGINE if site is not None or kernels.AVAILABLE else 'sweep'
+
+
+def relax(grid, site=None, K=K, engine='auto'):
+    # relaxes the grid in place with the chosen engine and returns the
+    # avalanche size (total number of topplings); 'auto' picks the compiled
+    # engine when numba is installed and otherwise the NumPy frontier engine
+    # for a grain at a site and full-grid sweeps for the whole grid
+    if engine == 'auto':
+        engine = _auto(site)
+    try:
+        run = ENGINES[engine]
+    except KeyError:
+        raise ValueError(f"unknown engine {engine!r}, expected one of {sorted(ENGINES)}") from None
+    return run(grid, site, K)
+
+
+def relax_profiled(grid, site=None, K=K, engine='auto', hooks=None, n=0):
+    # relaxes the grid in place like relax() and reports to hooks (see
+    # hooks.py): every hooks.every-th sweep as it happens (as soon as the
+    # avalanche is over for the compiled engine) and then the avalanche,
+    # numbered n. Without hooks this is relax(). Wide grids also go through
+    # the compiled frontier kernel, since the stack kernel has no sweeps
+    if hooks is None:
+        return relax(grid, site, K, engine)
+    if engine == 'auto':
+        engine = _auto(site)
+    if engine not in ENGINES:
+        raise ValueError(f"unknown engine {engine!r}, expected one of {sorted(ENGINES)}")
+    if engine in ('tiled', 'bulk'):
+        # these engines have no sweeps; the avalanche is reported with duration None
+        if hooks.sweep_hooks:
+            raise ValueError(f"the {engine!r} engine does not count sweeps, "
+                             "use another engine with sweep hooks")
+        start = time.perf_counter()
+        avalanche_size = relax(grid, site, K, engine)
+        hooks.avalanche(n, site, avalanche_size, None, time.perf_counter() - start)
+        return avalanche_size
+    if not grid.flags.c_contiguous:
+        work = np.ascontiguousarray(grid)
+        avalanche_size = relax_profiled(work, site, K, engine, hooks, n)
+        grid[...] = work
+        return avalanche_size
+    on_sweep = _sampler(hooks, n)
+    avalanche_size = duration = 0
+    start = time.perf_counter()
+    if engine == 'sweep':
+        while True:
+            t = time.perf_counter()
+            count = topple(grid, K)
+            if count == 0:
+                break
+            avalanche_size += count
+            duration += 1
+            if on_sweep is not None:
+                on_sweep(count, time.perf_counter() - t)
+    elif engine == 'frontier':
+        avalanche_size, _, duration, _ = _frontier(grid, site, K, False, on_sweep)
+        zero_boundary(grid)
+    else:
+        stack, m = _seed(grid, site, K)
+        trace = _trace(grid, hooks)
+        if m:
+            avalanche_size, _, duration, _ = _frontier_kernel(grid, stack, m, K, False, trace)
+        zero_boundary(grid)
+    seconds = time.perf_counter() - start
+    if engine == 'numba' and hooks.sweep_hooks:
+        _replay(hooks, n, trace, duration)
+    hooks.avalanche(n, site, int(avalanche_size), int(duration), seconds)
+    return int(avalanche_size)
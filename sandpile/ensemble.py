@@ -0,0 +1,113 @@
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from .activity import ActivityMap
+from .checkpoint import Checkpointer, load_checkpoint, resume
+from .cache import stable_state
+from .drive import STRATEGIES, simulate
+from .engine import K
+from .eventlog import EventLog
+from .metrics import MetricsPublisher
+from .stats import AvalancheStats
+from .warmup import warm_up
+
+# one driven run: grains dropped with a named strategy from drive.STRATEGIES
+# onto the stable state of an N x N grid, with its own seeded RNG stream
+Job = namedtuple('Job', ['strategy', 'seed', 'N', 'num_avalanches'])
+
+
+def job_name(job):
+    # file name stem for the checkpoint and event log of a job
+    return f'{job.strategy}-N{job.N}-seed{job.seed}-{job.num_avalanches}'
+
+
+def run_job(job, grid, stats=False, checkpoint_dir=None, events_dir=None, K=K, engine='auto',
+            activity_dir=None, metrics_dir=None, warmup=False):
+    # runs a single job starting from a copy of grid. With a checkpoint_dir
+    # the job saves its progress there and picks up from an earlier
+    # checkpoint; with an events_dir every avalanche is logged there, with
+    # an activity_dir the job's ActivityMap (see activity.py) is saved
+    # there when it is done, and with a metrics_dir its progress is
+    # published on a Unix socket there (see metrics.py). With warmup the
+    # grid is first taken to the stationary state of the job's strategy
+    # (see warmup.py), drawing from the job's RNG; resumed jobs are past it
+    rng = np.random.default_rng(job.seed)
+    collector = AvalancheStats() if stats else None
+    events = None if events_dir is None else os.path.join(events_dir, job_name(job) + '.events')
+    activity = None if activity_dir is None else ActivityMap(grid.shape)
+    metrics = None if metrics_dir is None else os.path.join(metrics_dir, job_name(job) + '.sock')
+    checkpointer = None
+    if checkpoint_dir is not None:
+        path = os.path.join(checkpoint_dir, job_name(job) + '.npz')
+        if os.path.exists(path):
+            result = resume(path, engine=engine, events=events, metrics=metrics)
+            if activity is not None:
+                activity = load_checkpoint(path).activity
+                if activity is None:
+                    raise ValueError(f"{path} was saved without an activity map")
+                activity.save(os.path.join(activity_dir, job_name(job) + '.activity.npz'))
+            return result
+        checkpointer = Checkpointer(path, strategy=job.strategy, num_avalanches=job.num_avalanches, K=K,
+                                    activity=activity)
+    grid = grid.copy()
+    if warmup:
+        warm_up(grid, job.strategy, rng, K)
+    log = None if events is None else EventLog(events)
+    publisher = None if metrics is None else MetricsPublisher(collector, metrics, job.num_avalanches)
+    try:
+        result = simulate(grid, job.strategy, job.num_avalanches, rng, K, engine, collector,
+                          checkpointer, events=log, activity=activity)
+    finally:
+        if log is not None:
+            log.close()
+        if publisher is not None:
+            publisher.close()
+    if activity is not None:
+        activity.save(os.path.join(activity_dir, job_name(job) + '.activity.npz'))
+    return result
+
+
+def run_ensemble(jobs, workers=None, stats=False, checkpoint_dir=None, events_dir=None, K=K,
+                 engine='auto', activity_dir=None, metrics_dir=None, warmup=False):
+    # runs the jobs on a process pool, one core per job, and returns their
+    # avalanche-size arrays in job order (or one AvalancheStats collector per
+    # job with stats=True). Every job draws from its own Generator seeded with
+    # job.seed, so the result does not depend on the number of workers.
+    # With a checkpoint_dir (stats=True only) interrupted jobs are resumed,
+    # with an events_dir each job writes an event log (see eventlog.py) and
+    # with an activity_dir its per-cell toppling counts (see activity.py).
+    # With a metrics_dir (stats=True only) every job publishes its progress
+    # on a Unix socket there, which `python -m sandpile watch` tails. With
+    # warmup every job starts from the stationary state of its strategy
+    if checkpoint_dir is not None:
+        if not stats:
+            raise ValueError("checkpointing needs stats=True")
+        os.makedirs(checkpoint_dir, exist_ok=True)
+    if metrics_dir is not None:
+        if not stats:
+            raise ValueError("publishing metrics needs stats=True")
+        os.makedirs(metrics_dir, exist_ok=True)
+    if activity_dir is not None:
+        os.makedirs(activity_dir, exist_ok=True)
+    jobs = [Job(*job) for job in jobs]
+    for job in jobs:
+        if job.strategy not in STRATEGIES:
+            raise ValueError(f"unknown strategy {job.strategy!r}, expected one of {sorted(STRATEGIES)}")
+    # the starting grid is loaded once per grid size and shipped to workers
+    grids = {N: np.array(stable_state(N, K=K)) for N in sorted({job.N for job in jobs})}
+    starts = [grids[job.N] for job in jobs]
+    if workers is None:
+        workers = min(len(jobs), os.cpu_count() or 1)
+    if workers <= 1:
+        return [run_job(job, grid, stats, checkpoint_dir, events_dir, K, engine, activity_dir,
+                        metrics_dir, warmup)
+                for job, grid in zip(jobs, starts)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        run = partial(run_job, stats=stats, checkpoint_dir=checkpoint_dir, events_dir=events_dir,
+                      K=K, engine=engine, activity_dir=activity_dir, metrics_dir=metrics_dir,
+                      warmup=warmup)
+        return list(pool.map(run, jobs, starts))
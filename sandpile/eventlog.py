@@ -0,0 +1,107 @@
+# Columnar event log: one raw binary file per column in a directory, appended
+# to in large chunks as the run goes, so that analysis can reopen every column
+# as a memory-mapped numpy array without loading the run into RAM. A new log
+# replaces whatever was at its path; only resumed runs (start=n) add to one.
+import json
+import os
+
+import numpy as np
+
+from .stats import AvalancheStats
+
+# column dtypes; i, j is the drop site, the rest are engine.Observation fields
+COLUMNS = {
+    'i': np.int32,
+    'j': np.int32,
+    'size': np.int64,
+    'area': np.int64,
+    'duration': np.int32,
+    'radius': np.float32,
+    'lost': np.int64,
+}
+
+
+class EventLog:
+    # writes one record per avalanche to the directory at path. Records are
+    # gathered in preallocated chunk buffers and appended to the column files
+    # when a chunk is full, on flush() and on close(). With observables=False
+    # only i, j and size are logged. Without start an existing log at path is
+    # overwritten; start=n reopens it and truncates it to its first n records
+    # (e.g. when resuming a checkpoint), then appends
+
+    def __init__(self, path, observables=True, chunk=1 << 16, start=None):
+        self.path = path
+        self.observables = observables
+        self.columns = list(COLUMNS) if observables else ['i', 'j', 'size']
+        self.chunk = chunk
+        self._buffers = {name: np.zeros(chunk, dtype=COLUMNS[name]) for name in self.columns}
+        self._n = 0
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'columns': {name: np.dtype(COLUMNS[name]).str for name in self.columns}}, f)
+        self._files = {}
+        for name in self.columns:
+            f = open(self._column_path(name), 'r+b' if start else 'wb')
+            length = (start or 0) * np.dtype(COLUMNS[name]).itemsize
+            if os.fstat(f.fileno()).st_size < length:
+                f.close()
+                raise ValueError(f"event log {path} has fewer than {start} records")
+            f.truncate(length)
+            f.seek(0, os.SEEK_END)
+            self._files[name] = f
+
+    def _column_path(self, name):
+        return os.path.join(self.path, f'{name}.bin')
+
+    def append(self, i, j, *values):
+        # values are the avalanche size, or all fields of an Observation
+        n = self._n
+        buffers = self._buffers
+        buffers['i'][n] = i
+        buffers['j'][n] = j
+        for name, value in zip(self.columns[2:], values):
+            buffers[name][n] = value
+        self._n = n + 1
+        if self._n == self.chunk:
+            self.flush()
+
+    def flush(self):
+        for name, f in self._files.items():
+            self._buffers[name][:self._n].tofile(f)
+            f.flush()
+        self._n = 0
+
+    def close(self):
+        if self._files:
+            self.flush()
+            for f in self._files.values():
+                f.close()
+            self._files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_events(path):
+    # the columns of the event log at path as read-only memory-mapped arrays.
+    # A log cut short by a crash is trimmed to its complete records
+    with open(os.path.join(path, 'meta.json')) as f:
+        dtypes = {name: np.dtype(code) for name, code in json.load(f)['columns'].items()}
+    count = min(os.path.getsize(os.path.join(path, f'{name}.bin')) // dtype.itemsize
+                for name, dtype in dtypes.items())
+    return {name: np.memmap(os.path.join(path, f'{name}.bin'), dtype=dtype, mode='r', shape=(count,))
+            if count else np.zeros(0, dtype=dtype)
+            for name, dtype in dtypes.items()}
+
+
+def events_stats(path, chunk=1 << 22):
+    # rebuilds the avalanche-size statistics of a logged run in chunks, so
+    # memory use does not depend on the number of events
+    sizes = read_events(path)['size']
+    stats = AvalancheStats()
+    for start in range(0, len(sizes), chunk):
+        stats.update(sizes[start:start + chunk])
+    return stats
@@ -0,0 +1,128 @@
+import numpy as np
+
+from .engine import K, _unstable, zero_boundary
+
+# Sweep-by-sweep recordings of avalanches for replay and animation. Instead
+# of a grid per sweep only the cells a sweep changed are kept, with their
+# height changes (-4..4 on the square lattice, stored in one byte), so a
+# recording costs about as much as the avalanche's topplings; the grid it
+# started from is stored once. Frames are rebuilt on demand by applying the
+# changes forwards or backwards from the last frame asked for.
+
+
+class AvalancheFrames:
+    # the frames of one recorded avalanche: frame t is the grid after t
+    # sweeps, from frame 0 (the start) to frame len(self) (the final grid).
+    # The changes of sweep t are cells[offsets[t - 1]:offsets[t]] (flat
+    # indices) and deltas[...] over the same range
+
+    def __init__(self, start, cells, deltas, offsets, site=None):
+        self.start = start
+        self.cells = cells
+        self.deltas = deltas
+        self.offsets = offsets
+        self.site = site
+        self._t = 0
+        self._grid = None
+
+    def __len__(self):
+        # the number of sweeps
+        return len(self.offsets) - 1
+
+    def changes(self, t):
+        # (cells, deltas) of sweep t, 1 <= t <= len(self)
+        if not 1 <= t <= len(self):
+            raise IndexError(f"sweep {t} out of range 1..{len(self)}")
+        a, b = self.offsets[t - 1], self.offsets[t]
+        return self.cells[a:b], self.deltas[a:b]
+
+    def frame(self, t):
+        # a copy of the grid after t sweeps. Walking from the frame asked
+        # for last, so stepping through the frames in either direction
+        # costs only the changes in between
+        if not 0 <= t <= len(self):
+            raise IndexError(f"frame {t} out of range 0..{len(self)}")
+        if self._grid is None or abs(t - self._t) > t:
+            self._grid = np.array(self.start, dtype=np.int16)
+            self._t = 0
+        flat = self._grid.reshape(-1)
+        while self._t < t:
+            self._t += 1
+            cells, deltas = self.changes(self._t)
+            flat[cells] += deltas
+        while self._t > t:
+            cells, deltas = self.changes(self._t)
+            flat[cells] -= deltas
+            self._t -= 1
+        return self._grid.astype(self.start.dtype)
+
+    def frames(self, every=1):
+        # every every-th frame, and the last one, built one after the other
+        for t in range(0, len(self), every):
+            yield self.frame(t)
+        yield self.frame(len(self))
+
+    def nbytes(self):
+        # memory taken by the recorded changes
+        return self.cells.nbytes + self.deltas.nbytes + self.offsets.nbytes
+
+    def save(self, path):
+        np.savez_compressed(path, start=self.start, cells=self.cells, deltas=self.deltas,
+                            offsets=self.offsets,
+                            site=np.array(self.site if self.site is not None else (-1, -1)))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            site = tuple(int(x) for x in data['site'])
+            return cls(data['start'], data['cells'], data['deltas'], data['offsets'],
+                       None if site == (-1, -1) else site)
+
+    def animate(self, path, every=1, fps=10, title=None, **style):
+        # writes the frames to an animated GIF (see report.plot_animation)
+        from .report import plot_animation
+        count = len(range(0, len(self), every)) + 1
+        plot_animation(path, self.frames(every), count, title or "Avalanche", fps, **style)
+
+
+def record_avalanche(grid, site=None, K=K):
+    # relaxes the grid in place one synchronous sweep at a time, like the
+    # frontier engine, and returns the avalanche size and its AvalancheFrames.
+    # Grains falling onto the boundary are not recorded, as the boundary is
+    # zeroed once the avalanche is over
+    start = np.array(grid)
+    zero_boundary(start)
+    work = np.ascontiguousarray(grid, dtype=np.int64)
+    N, M = work.shape
+    flat = work.reshape(-1)
+    if site is None:
+        frontier = np.flatnonzero(flat > K)
+    else:
+        frontier = np.array([site[0] * M + site[1]])
+    frontier = _unstable(flat, frontier, work.shape, K)
+    offsets = (M, -M, 1, -1)
+    cells, deltas, ends = [], [], [0]
+    avalanche_size = 0
+    while frontier.size:
+        avalanche_size += frontier.size
+        flat[frontier] -= 4
+        for off in offsets:
+            flat[frontier + off] += 1
+        # height changes of the sweep: -4 per toppling, +1 per toppled neighbour
+        touched = np.concatenate([frontier] + [frontier + off for off in offsets])
+        weights = np.repeat([-4, 1, 1, 1, 1], frontier.size)
+        changed, inverse = np.unique(touched, return_inverse=True)
+        delta = np.bincount(inverse, weights=weights).astype(np.int8)
+        i, j = np.divmod(changed, M)
+        keep = (delta != 0) & (i > 0) & (i < N - 1) & (j > 0) & (j < M - 1)
+        cells.append(changed[keep].astype(np.int32))
+        deltas.append(delta[keep])
+        ends.append(ends[-1] + int(np.count_nonzero(keep)))
+        frontier = _unstable(flat, changed, work.shape, K)
+    zero_boundary(work)
+    grid[...] = work
+    frames = AvalancheFrames(start,
+                             np.concatenate(cells) if cells else np.zeros(0, dtype=np.int32),
+                             np.concatenate(deltas) if deltas else np.zeros(0, dtype=np.int8),
+                             np.array(ends, dtype=np.int64), site)
+    return avalanche_size, frames
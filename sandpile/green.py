@@ -0,0 +1,88 @@
+# Predicted avalanche sizes from the lattice Green's function. In the
+# stationary state of the abelian sandpile with open boundaries, the expected
+# number of topplings at y caused by a grain dropped at x is G(x, y), the
+# inverse of the Dirichlet Laplacian on the interior cells (Dhar 1990). The
+# expected avalanche size from x is therefore sum_y G(x, y) = (G 1)(x), which
+# takes a single sparse solve per grid size. Needs scipy.
+from collections import namedtuple
+
+import numpy as np
+
+from .cache import cached_array
+from .drive import site_distribution
+
+
+def require_scipy():
+    # imports the parts of scipy used here, so that runs ending in a
+    # validation can check for them before they start
+    try:
+        import scipy.sparse
+        import scipy.sparse.linalg
+    except ImportError:
+        raise ImportError("green.py needs scipy for the sparse Laplacian (pip install scipy)") from None
+    return scipy.sparse
+
+
+def laplacian(N):
+    # Dirichlet Laplacian (4 on the diagonal, -1 per neighbour) on the
+    # (N-2) x (N-2) interior cells of an N x N grid, as a sparse matrix
+    sp = require_scipy()
+    n = N - 2
+    T = sp.diags([-1, 2, -1], [-1, 0, 1], shape=(n, n), dtype=float)
+    I = sp.identity(n)
+    return (sp.kron(T, I) + sp.kron(I, T)).tocsc()
+
+
+def _solve(N, rhs):
+    from scipy.sparse.linalg import spsolve
+    solution = np.zeros((N, N))
+    solution[1:-1, 1:-1] = spsolve(laplacian(N), rhs.ravel()).reshape(N-2, N-2)
+    return solution
+
+
+def mean_size_map(N, directory=None):
+    # expected avalanche size for a grain dropped on each cell of an N x N
+    # grid (0 on the boundary, where grains are lost); computed once per N
+    # and then loaded from the cache
+    return cached_array(f'green-mean-N{N}.npy', lambda: _solve(N, np.ones((N-2, N-2))), directory)
+
+
+def green_function(N, site):
+    # expected number of topplings at every cell for a grain dropped at site
+    i, j = site
+    if not (0 < i < N-1 and 0 < j < N-1):
+        return np.zeros((N, N))
+    rhs = np.zeros((N-2, N-2))
+    rhs[i-1, j-1] = 1
+    return _solve(N, rhs)
+
+
+def predicted_mean(N, strategy, directory=None):
+    # expected avalanche size under a drop strategy (Random, Middle, Edges)
+    return float((site_distribution(strategy, N) * mean_size_map(N, directory)).sum())
+
+
+Validation = namedtuple('Validation', ['strategy', 'predicted', 'simulated', 'stderr',
+                                       'rel_error', 'ok'])
+
+
+def validate(stats, N, strategy, rtol=0.05, directory=None, nsigma=3):
+    # compares the mean avalanche size of a finished run (an AvalancheStats
+    # collector or an array of sizes) with the prediction, which holds for
+    # runs driven from the stationary state (see warmup.py). The run passes
+    # when it is within rtol of the prediction or within nsigma standard
+    # errors of it, so short runs with heavy-tailed sizes are not failed on
+    # noise. stderr assumes independent avalanches, so it underestimates the
+    # error of short runs
+    if hasattr(stats, 'size_counts'):
+        sizes, counts = stats.size_counts()
+    else:
+        sizes, counts = np.unique(np.asarray(stats), return_counts=True)
+    count = counts.sum()
+    simulated = (sizes * counts).sum() / count
+    variance = (counts * (sizes - simulated)**2).sum() / max(count - 1, 1)
+    predicted = predicted_mean(N, strategy, directory)
+    stderr = np.sqrt(variance / count)
+    rel_error = abs(simulated - predicted) / predicted
+    ok = abs(simulated - predicted) <= max(rtol * predicted, nsigma * stderr)
+    return Validation(strategy, predicted, float(simulated), float(stderr), float(rel_error), bool(ok))
@@ -0,0 +1,145 @@
+import numpy as np
+
+from .stats import AvalancheStats
+
+
+class Hooks:
+    # instrumentation for the relaxation loop, passed to simulate(),
+    # relax_profiled() or relax_observed(). After every avalanche each
+    # avalanche hook is called as
+    #     hook(n, site, size, duration, seconds)
+    # (n numbers the avalanches, site is None when the whole grid was relaxed
+    # and duration is the number of sweeps, or None for the 'tiled' and
+    # 'bulk' engines, which have none), and after every `every`-th sweep
+    # each sweep hook as
+    #     hook(n, sweep, frontier, seconds)
+    # with the number of cells that toppled in that sweep. The compiled
+    # engine cannot call back mid-avalanche, so its sweeps are reported once
+    # the avalanche is over and with seconds None. Without a Hooks object
+    # the engines run uninstrumented
+
+    def __init__(self, avalanche=(), sweep=(), every=1):
+        self.avalanche_hooks = list(avalanche)
+        self.sweep_hooks = list(sweep)
+        self.every = every
+
+    def add(self, collector):
+        # installs the avalanche() and/or sweep() methods of a collector
+        if hasattr(collector, 'avalanche'):
+            self.avalanche_hooks.append(collector.avalanche)
+        if hasattr(collector, 'sweep'):
+            self.sweep_hooks.append(collector.sweep)
+        return collector
+
+    def avalanche(self, n, site, size, duration, seconds):
+        for hook in self.avalanche_hooks:
+            hook(n, site, size, duration, seconds)
+
+    def sweep(self, n, sweep, frontier, seconds):
+        for hook in self.sweep_hooks:
+            hook(n, sweep, frontier, seconds)
+
+
+class SweepCounter:
+    # distribution of sweeps per avalanche, kept in an AvalancheStats;
+    # avalanches without a sweep count are left out
+
+    def __init__(self):
+        self.stats = AvalancheStats()
+
+    def avalanche(self, n, site, size, duration, seconds):
+        if duration is not None:
+            self.stats.add(duration)
+
+    def summary(self):
+        return (f"sweeps per avalanche: mean {self.stats.mean:.2f}, max {self.stats.max}"
+                if self.stats.count else "sweeps per avalanche: no avalanches")
+
+
+class SweepTimer:
+    # time per sweep. The average over whole avalanches covers every engine;
+    # sampled sweeps of the NumPy engines are also timed one by one and
+    # binned by frontier size (powers of two), to show how the cost of a
+    # sweep grows with the number of cells toppling
+
+    def __init__(self, bins=48):
+        self.counts = np.zeros(bins, dtype=np.int64)   # bin b: 2**b <= frontier < 2**(b+1)
+        self.seconds = np.zeros(bins, dtype=np.float64)
+        self.sweeps = 0
+        self.total = 0.0
+
+    def avalanche(self, n, site, size, duration, seconds):
+        if duration is not None:
+            self.sweeps += duration
+            self.total += seconds
+
+    def sweep(self, n, sweep, frontier, seconds):
+        if seconds is not None and frontier > 0:
+            b = min(int(frontier).bit_length() - 1, self.counts.size - 1)
+            self.counts[b] += 1
+            self.seconds[b] += seconds
+
+    def table(self):
+        # (smallest frontier in the bin, sweeps timed, mean seconds per sweep)
+        return [(1 << b, int(self.counts[b]), self.seconds[b] / self.counts[b])
+                for b in np.flatnonzero(self.counts)]
+
+    def summary(self):
+        lines = [f"time per sweep: {self.total / max(self.sweeps, 1) * 1e6:.2f} us "
+                 f"({self.sweeps} sweeps in {self.total:.3f} s)"]
+        lines += [f"  frontier >= {low:<8} {count:10} sweeps  {seconds * 1e6:10.2f} us"
+                  for low, count, seconds in self.table()]
+        return '\n'.join(lines)
+
+
+class FrontierTrace:
+    # the frontier size of every sampled sweep, as columns 'avalanche',
+    # 'sweep' and 'frontier' in arrays that are doubled when full
+
+    columns = ('avalanche', 'sweep', 'frontier')
+
+    def __init__(self, capacity=1024):
+        self._data = {name: np.zeros(capacity, dtype=np.int64) for name in self.columns}
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, name):
+        return self._data[name][:self.count]
+
+    def sweep(self, n, sweep, frontier, seconds):
+        i = self.count
+        if i == len(self._data['sweep']):
+            for name, column in self._data.items():
+                grown = np.zeros(2 * max(i, 1), dtype=column.dtype)
+                grown[:i] = column
+                self._data[name] = grown
+        self._data['avalanche'][i] = n
+        self._data['sweep'][i] = sweep
+        self._data['frontier'][i] = frontier
+        self.count = i + 1
+
+    def summary(self):
+        if not self.count:
+            return "frontier: no sweeps sampled"
+        frontier = self['frontier']
+        return (f"frontier: {self.count} sweeps sampled, mean {frontier.mean():.1f}, "
+                f"max {frontier.max()} cells")
+
+
+class Progress:
+    # prints a line every `every` avalanches, or every `every` sweeps (of
+    # those passed on by Hooks) when installed as a sweep hook
+
+    def __init__(self, every=100):
+        self.every = every
+
+    def avalanche(self, n, site, size, duration, seconds):
+        if (n + 1) % self.every == 0:
+            sweeps = "" if duration is None else f", {duration} sweeps"
+            print(f"Avalanche {n + 1}: size {size}{sweeps}, {seconds * 1e3:.2f} ms")
+
+    def sweep(self, n, sweep, frontier, seconds):
+        if sweep % self.every == 0:
+            print(f"Sweep {sweep}: {frontier} topplings")
@@ -0,0 +1,279 @@
+# optional compiled kernels; numba is not required and the NumPy engines in
+# engine.py are used when it is missing
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+AVAILABLE = njit is not None
+
+if AVAILABLE:
+
+    @njit(cache=True, nogil=True)
+    def relax_stack(grid, stack, n, K):
+        # relaxes the grid in place starting from the n unstable cells in
+        # stack[:n]. A cell is pushed only when it crosses K and is toppled
+        # all the way back to stable when popped, so it is on the stack at
+        # most once and a buffer of grid.size entries is always enough
+        N, M = grid.shape
+        avalanche_size = 0
+        while n > 0:
+            n -= 1
+            c = stack[n]
+            i = c // M
+            j = c - i * M
+            h = grid[i, j]
+            t = (h - K - 1) // 4 + 1  # legal topplings in a row
+            grid[i, j] = h - 4 * t
+            avalanche_size += t
+            for d in range(4):
+                if d == 0:
+                    ni, nj = i + 1, j
+                elif d == 1:
+                    ni, nj = i - 1, j
+                elif d == 2:
+                    ni, nj = i, j + 1
+                else:
+                    ni, nj = i, j - 1
+                h = grid[ni, nj]
+                grid[ni, nj] = h + t
+                # boundary cells never topple; they are zeroed afterwards
+                if h <= K and h + t > K and 0 < ni < N - 1 and 0 < nj < M - 1:
+                    stack[n] = ni * M + nj
+                    n += 1
+        return avalanche_size
+
+    @njit(cache=True, nogil=True)
+    def relax_frontier(grid, frontier, n, following, mark, K, observe, visited, touched, trace,
+                       odometer):
+        # relaxes the flattened N x M grid in place one synchronous sweep at a
+        # time, starting from the n unstable cells in frontier[:n]. Every
+        # unstable cell topples once per sweep and all cells lose their grains
+        # before any neighbour gains, so heights never go above
+        # max(initial, K + 4) and one-byte grids cannot overflow.
+        # following and mark are scratch buffers of grid.size entries; mark
+        # must be all zero and is left that way. Boundary cells only collect
+        # lost grains and are zeroed by the caller, so wrap-around there is
+        # harmless. With observe, the distinct toppled cells are written to
+        # touched (visited is an all-zero scratch buffer like mark) and the
+        # number of sweeps and of grains sent onto the boundary are counted.
+        # The frontier size of sweep s is written to trace[s - 1] for as
+        # many sweeps as trace holds (pass an empty array to skip this), and
+        # every toppling adds one at its cell of the flat odometer (skipped
+        # when empty as well). Returns (avalanche_size, area, duration, lost)
+        N, M = grid.shape
+        flat = grid.reshape(-1)
+        offsets = (M, -M, 1, -1)
+        avalanche_size = 0
+        area = 0
+        duration = 0
+        lost = 0
+        while n > 0:
+            avalanche_size += n
+            duration += 1
+            if duration <= trace.size:
+                trace[duration - 1] = n
+            for k in range(n):
+                flat[frontier[k]] -= 4
+            if odometer.size:
+                for k in range(n):
+                    odometer[frontier[k]] += 1
+            for k in range(n):
+                for off in offsets:
+                    flat[frontier[k] + off] += 1
+            if observe:
+                for k in range(n):
+                    c = frontier[k]
+                    i = c // M
+                    j = c - i * M
+                    lost += (i == 1) + (i == N - 2) + (j == 1) + (j == M - 2)
+                    if visited[c] == 0:
+                        visited[c] = 1
+                        touched[area] = c
+                        area += 1
+            # only toppled cells and their neighbours can be unstable now
+            m = 0
+            for k in range(n):
+                c = frontier[k]
+                for d in range(5):
+                    cc = c if d == 4 else c + offsets[d]
+                    i = cc // M
+                    j = cc - i * M
+                    if mark[cc] == 0 and flat[cc] > K and 0 < i < N - 1 and 0 < j < M - 1:
+                        mark[cc] = 1
+                        following[m] = cc
+                        m += 1
+            for k in range(m):
+                mark[following[k]] = 0
+            frontier, following = following, frontier
+            n = m
+        for k in range(area):
+            visited[touched[k]] = 0
+        return avalanche_size, area, duration, lost
+
+    @njit(cache=True, nogil=True)
+    def relax_odometer(grid, stack, n, K, odometer):
+        # relax_stack() that also adds each cell's topplings to odometer
+        N, M = grid.shape
+        avalanche_size = 0
+        while n > 0:
+            n -= 1
+            c = stack[n]
+            i = c // M
+            j = c - i * M
+            h = grid[i, j]
+            t = (h - K - 1) // 4 + 1
+            grid[i, j] = h - 4 * t
+            odometer[i, j] += t
+            avalanche_size += t
+            for d in range(4):
+                if d == 0:
+                    ni, nj = i + 1, j
+                elif d == 1:
+                    ni, nj = i - 1, j
+                elif d == 2:
+                    ni, nj = i, j + 1
+                else:
+                    ni, nj = i, j - 1
+                h = grid[ni, nj]
+                grid[ni, nj] = h + t
+                if h <= K and h + t > K and 0 < ni < N - 1 and 0 < nj < M - 1:
+                    stack[n] = ni * M + nj
+                    n += 1
+        return avalanche_size
+
+    @njit(cache=True, nogil=True)
+    def untopple(grid, odometer, K, k, inset, outs, queue):
+        # takes k topplings back from every cell of the largest set S of
+        # cells with odometer >= k that stays stable doing so: a cell of S
+        # gains k grains from each neighbour outside S, so cells with
+        # grid + k * outs > K are burnt off S until none is left. The
+        # odometer stays a stabilizing one, and so an upper bound of the
+        # true one. inset and outs are scratch arrays shaped like grid (inset
+        # all zero on the boundary) and queue one of grid.size entries.
+        # Returns the size of S
+        N, M = grid.shape
+        q = 0
+        for i in range(1, N - 1):
+            for j in range(1, M - 1):
+                inset[i, j] = odometer[i, j] >= k
+        for i in range(1, N - 1):
+            for j in range(1, M - 1):
+                if inset[i, j]:
+                    outs[i, j] = 4 - inset[i + 1, j] - inset[i - 1, j] - inset[i, j + 1] - inset[i, j - 1]
+                    if grid[i, j] + k * outs[i, j] > K:
+                        queue[q] = i * M + j
+                        q += 1
+        while q > 0:
+            q -= 1
+            c = queue[q]
+            i = c // M
+            j = c - i * M
+            if inset[i, j] == 0:
+                continue
+            inset[i, j] = 0
+            for d in range(4):
+                if d == 0:
+                    ni, nj = i + 1, j
+                elif d == 1:
+                    ni, nj = i - 1, j
+                elif d == 2:
+                    ni, nj = i, j + 1
+                else:
+                    ni, nj = i, j - 1
+                if inset[ni, nj]:
+                    outs[ni, nj] += 1
+                    if grid[ni, nj] + k * outs[ni, nj] > K:
+                        queue[q] = ni * M + nj
+                        q += 1
+        size = 0
+        for i in range(1, N - 1):
+            for j in range(1, M - 1):
+                if inset[i, j]:
+                    size += 1
+                    odometer[i, j] -= k
+                    grid[i, j] += 4 * k
+                    grid[i + 1, j] -= k
+                    grid[i - 1, j] -= k
+                    grid[i, j + 1] -= k
+                    grid[i, j - 1] -= k
+        return size
+
+    @njit(cache=True, nogil=True)
+    def divisible_sweeps(w, h, density, omega, sweeps):
+        # projected SOR sweeps for the divisible sandpile odometer w >= 0,
+        # where every cell with w > 0 ends at exactly density: h + lap(w) =
+        # density there (the boundary of w stays zero)
+        N, M = w.shape
+        for s in range(sweeps):
+            for i in range(1, N - 1):
+                for j in range(1, M - 1):
+                    target = (h[i, j] - density + w[i + 1, j] + w[i - 1, j] + w[i, j + 1] + w[i, j - 1]) / 4
+                    x = w[i, j] + omega * (target - w[i, j])
+                    w[i, j] = x if x > 0 else 0.0
+
+    def model_kernel(di, dj, parity, boundary):
+        # builds a synchronous relaxation kernel for one lattice and boundary
+        # (see models.py), with the neighbour offsets compiled in as
+        # constants. Neighbour d of cell (i, j) is (i + di[d], j + dj[d]),
+        # used only by cells with (i + j) % 2 == parity[d] unless parity[d]
+        # is -1. Grains crossing the left or right edge are kept by the cell
+        # ('closed') or wrap around ('periodic'); with 'open' the edge
+        # columns never topple and nothing crosses. Works like
+        # relax_frontier() without observables, so heights never exceed
+        # max(initial, K + degree). Returns the avalanche size
+        degree = len(di)
+        closed = boundary == 'closed'
+        first = 1 if boundary == 'open' else 0  # first column that topples
+
+        @njit(cache=True, nogil=True)
+        def neighbour(i, j, d, M):
+            # (row, column, linked) of neighbour d of cell (i, j)
+            if parity[d] >= 0 and (i + j) % 2 != parity[d]:
+                return i, j, False
+            nj = j + dj[d]
+            if nj < 0 or nj >= M:
+                if closed:
+                    return i, j, False
+                nj = nj % M
+            return i + di[d], nj, True
+
+        @njit(cache=True, nogil=True)
+        def relax_model(grid, frontier, n, following, mark, K):
+            N, M = grid.shape
+            avalanche_size = 0
+            while n > 0:
+                avalanche_size += n
+                for k in range(n):
+                    i = frontier[k] // M
+                    j = frontier[k] - i * M
+                    for d in range(degree):
+                        if neighbour(i, j, d, M)[2]:
+                            grid[i, j] -= 1
+                for k in range(n):
+                    i = frontier[k] // M
+                    j = frontier[k] - i * M
+                    for d in range(degree):
+                        ni, nj, linked = neighbour(i, j, d, M)
+                        if linked:
+                            grid[ni, nj] += 1
+                # only toppled cells and their neighbours can be unstable now
+                m = 0
+                for k in range(n):
+                    i = frontier[k] // M
+                    j = frontier[k] - i * M
+                    for d in range(degree + 1):
+                        ni, nj, linked = (i, j, True) if d == degree else neighbour(i, j, d, M)
+                        c = ni * M + nj
+                        if (linked and mark[c] == 0 and grid[ni, nj] > K and 0 < ni < N - 1
+                                and first <= nj < M - first):
+                            mark[c] = 1
+                            following[m] = c
+                            m += 1
+                for k in range(m):
+                    mark[following[k]] = 0
+                frontier, following = following, frontier
+                n = m
+            return avalanche_size
+
+        return relax_model
@@ -0,0 +1,219 @@
+import asyncio
+import glob
+import json
+import os
+import re
+import threading
+import time
+
+# Live throughput metrics of running simulations. A MetricsPublisher reads
+# the run's AvalancheStats collector from a background thread every
+# `interval` seconds and streams one JSON line per reading to every client
+# connected to its address, a Unix socket path or a localhost host:port.
+# The simulation loop is not touched: it only keeps updating its
+# collector, and the compiled kernels release the GIL while they run, so
+# publishing costs the loop nothing measurable. Slow clients miss readings
+# rather than hold the publisher up. watch() tails several publishers (the
+# workers of an ensemble) at once with asyncio; any line-oriented client
+# works too, e.g. `nc -U ensemble/Random-N200-seed43-20000.sock`.
+#
+# A reading has the fields name, avalanches, target, topplings, elapsed
+# (seconds since the publisher started), avalanches_per_s and
+# topplings_per_s (over the last interval), mean_size, max_size, eta
+# (seconds left at the average rate so far, None if unknown) and done.
+
+_TCP = re.compile(r'^([\w.\-]*):(\d+)$')
+
+
+def _endpoint(address):
+    # (host, port) for host:port addresses, None for Unix socket paths
+    match = _TCP.match(address)
+    return (match.group(1) or '127.0.0.1', int(match.group(2))) if match else None
+
+
+class MetricsPublisher:
+    # publishes the progress of the collector `stats` towards `target`
+    # avalanches (None if open-ended) on address until close(); also a
+    # context manager. Readings are taken in a daemon thread running its own
+    # event loop
+
+    def __init__(self, stats, address, target=None, name=None, interval=1.0):
+        self.stats = stats
+        self.address = address
+        self.target = target
+        self.name = name or os.path.splitext(os.path.basename(address))[0]
+        self.interval = interval
+        self._clients = {}  # writer -> the task serving it
+        self._loop = None
+        self._stop = None
+        self._ready = threading.Event()
+        self._error = None
+        self._start = time.monotonic()
+        self._last = (self._start, stats.count, stats.total)
+        self._first = stats.count
+        self._thread = threading.Thread(target=self._run, name=f'metrics {self.name}', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def reading(self, done=False):
+        # the current metrics as a dict
+        now = time.monotonic()
+        count, total, top = self.stats.count, self.stats.total, self.stats.max
+        then, last_count, last_total = self._last
+        self._last = (now, count, total)
+        seconds = max(now - then, 1e-9)
+        elapsed = now - self._start
+        eta = None
+        if self.target is not None and count > self._first:
+            eta = (self.target - count) * elapsed / (count - self._first)
+        return {
+            'name': self.name, 'avalanches': count, 'target': self.target, 'topplings': total,
+            'elapsed': elapsed,
+            'avalanches_per_s': (count - last_count) / seconds,
+            'topplings_per_s': (total - last_total) / seconds,
+            'mean_size': total / count if count else None, 'max_size': top,
+            'eta': 0.0 if done else eta, 'done': done,
+        }
+
+    def _run(self):
+        try:
+            asyncio.run(self._serve())
+        except BaseException as error:  # reported by __init__ if it happens at startup
+            self._error = error
+            self._ready.set()
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        endpoint = _endpoint(self.address)
+        if endpoint is None:
+            if os.path.exists(self.address):
+                os.unlink(self.address)  # left over from an earlier run
+            server = await asyncio.start_unix_server(self._connected, self.address)
+        else:
+            server = await asyncio.start_server(self._connected, *endpoint)
+        self._ready.set()
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._stop.wait(), self.interval)
+                    break
+                except asyncio.TimeoutError:
+                    self._send(self.reading())
+            self._send(self.reading(done=True))
+            tasks = list(self._clients.values())
+            for writer in list(self._clients):
+                writer.close()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            server.close()
+            await server.wait_closed()
+            if endpoint is None and os.path.exists(self.address):
+                os.unlink(self.address)
+
+    async def _connected(self, reader, writer):
+        self._clients[writer] = asyncio.current_task()
+        try:
+            await reader.read()  # until the client hangs up
+        except ConnectionError:
+            pass
+        finally:
+            self._clients.pop(writer, None)
+
+    def _send(self, reading):
+        line = (json.dumps(reading) + '\n').encode()
+        for writer in list(self._clients):
+            if not writer.is_closing() and writer.transport.get_write_buffer_size() < 1 << 16:
+                writer.write(line)
+
+    def close(self):
+        # sends a last reading with done=True and stops publishing
+        if self._thread.is_alive() and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+            self._thread.join()
+
+
+def addresses(patterns):
+    # the publisher addresses named by patterns: host:port, Unix socket
+    # paths, or directories whose *.sock files are all tailed
+    found = []
+    for pattern in patterns:
+        if _endpoint(pattern) is None and os.path.isdir(pattern):
+            found += sorted(glob.glob(os.path.join(pattern, '*.sock')))
+        else:
+            found.append(pattern)
+    return found
+
+
+async def _tail(address, show, retry):
+    # passes the readings of one publisher to show until it is done,
+    # waiting up to `retry` seconds for it to come up
+    endpoint = _endpoint(address)
+    deadline = time.monotonic() + retry
+    while True:
+        try:
+            if endpoint is None:
+                reader, writer = await asyncio.open_unix_connection(address)
+            else:
+                reader, writer = await asyncio.open_connection(*endpoint)
+            break
+        except (FileNotFoundError, ConnectionError):
+            if time.monotonic() >= deadline:
+                raise
+            await asyncio.sleep(0.2)
+    try:
+        async for line in reader:
+            reading = json.loads(line)
+            show(reading)
+            if reading['done']:
+                break
+    finally:
+        writer.close()
+
+
+def format_reading(reading):
+    # one status line
+    done = reading['avalanches']
+    of = '' if reading['target'] is None else f"/{reading['target']}"
+    eta = reading['eta']
+    mean = reading['mean_size']
+    return (f"{reading['name']}: {done}{of} avalanches, "
+            f"{reading['avalanches_per_s']:.1f} avalanches/s, "
+            f"{reading['topplings_per_s']:.4g} topplings/s, "
+            f"mean size {'-' if mean is None else f'{mean:.2f}'}, max {reading['max_size']}, "
+            + ('done' if reading['done'] else f"ETA {'?' if eta is None else f'{eta:.0f} s'}"))
+
+
+async def _watch(patterns, show, retry):
+    # directories are searched again while the run goes on, as ensemble
+    # workers only open their sockets once their jobs start
+    tails = {}
+    deadline = time.monotonic() + retry
+    while True:
+        for address in addresses(patterns):
+            if address not in tails:
+                tails[address] = asyncio.create_task(_tail(address, show, retry))
+        if tails and all(task.done() for task in tails.values()):
+            break
+        if not tails and time.monotonic() >= deadline:
+            raise FileNotFoundError(f"no simulation publishes metrics at {' '.join(patterns)}")
+        await asyncio.sleep(0.5)
+    for task in tails.values():
+        task.result()
+
+
+def watch(patterns, show=None, retry=30.0):
+    # tails every publisher named by patterns (see addresses()) until all
+    # of them are done, printing a line per reading unless show, called
+    # with every reading, is given
+    if show is None:
+        show = lambda reading: print(format_reading(reading), flush=True)
+    asyncio.run(_watch(patterns, show, retry))
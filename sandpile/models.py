@@ -0,0 +1,168 @@
+import numpy as np
+
+from . import kernels
+from .engine import _buffer, relax, zero_boundary
+
+# Sandpile models: the lattice (which cells are neighbours), the threshold
+# K and the boundary. A cell topples when its height exceeds K and sends one
+# grain to each neighbour. Rows 0 and N-1 are always a sink that collects
+# the grains leaving the grid and is emptied after every relaxation; the
+# boundary decides what happens at the left and right edges:
+#
+#   open      columns 0 and M-1 are a sink as well (the standard model)
+#   closed    the edges reflect: a grain toppled across one stays put
+#   periodic  the edges wrap around, making the grid a cylinder
+#
+# Without a sink on at least two sides driven grids would never stabilise.
+# The standard model (square lattice, open boundary) runs on the engines of
+# engine.py; every other model gets a compiled kernel of its own (built
+# once per model by kernels.model_kernel) or, without numba, vectorised
+# synchronous sweeps.
+
+# neighbour offsets (di, dj, parity): an offset with parity p >= 0 is used
+# only by cells with (i + j) % 2 == p. The triangular lattice is stored
+# sheared, the hexagonal (honeycomb) one as a brick wall
+LATTICES = {
+    'square': ((1, 0, -1), (-1, 0, -1), (0, 1, -1), (0, -1, -1)),
+    'moore': ((1, 0, -1), (-1, 0, -1), (0, 1, -1), (0, -1, -1),
+              (1, 1, -1), (1, -1, -1), (-1, 1, -1), (-1, -1, -1)),
+    'triangular': ((1, 0, -1), (-1, 0, -1), (0, 1, -1), (0, -1, -1), (1, 1, -1), (-1, -1, -1)),
+    'hexagonal': ((0, 1, -1), (0, -1, -1), (1, 0, 0), (-1, 0, 1)),
+}
+
+BOUNDARIES = ('open', 'closed', 'periodic')
+
+
+class Model:
+    # one lattice, threshold and boundary. K defaults to the number of
+    # neighbours minus one (3 on the square lattice); a lower K would let
+    # toppling cells go negative
+
+    def __init__(self, lattice='square', K=None, boundary='open'):
+        if lattice not in LATTICES:
+            raise ValueError(f"unknown lattice {lattice!r}, expected one of {sorted(LATTICES)}")
+        if boundary not in BOUNDARIES:
+            raise ValueError(f"unknown boundary {boundary!r}, expected one of {BOUNDARIES}")
+        self.lattice = lattice
+        self.boundary = boundary
+        self.offsets = LATTICES[lattice]
+        self.degree = sum(p < 0 for _, _, p in self.offsets) + any(p >= 0 for _, _, p in self.offsets)
+        self.K = self.degree - 1 if K is None else K
+        if self.K < self.degree - 1:
+            raise ValueError(f"K={self.K} is below {self.degree - 1}: toppling would leave negative heights")
+        self._kernel = None
+        self._losses = {}
+
+    def __repr__(self):
+        return f"Model({self.lattice!r}, K={self.K}, boundary={self.boundary!r})"
+
+    @property
+    def standard(self):
+        # whether the engines of engine.py apply
+        return self.lattice == 'square' and self.boundary == 'open'
+
+    def _columns(self):
+        return slice(1, -1) if self.boundary == 'open' else slice(None)
+
+    def sink(self, grid):
+        # empties the sink cells
+        if self.boundary == 'open':
+            zero_boundary(grid)
+        else:
+            grid[..., 0, :] = 0
+            grid[..., -1, :] = 0
+
+    def initialize(self, N, V):
+        # an N x N grid with every cell outside the sink set to V
+        grid = np.zeros((N, N), dtype=np.uint8)
+        grid[1:-1, self._columns()] = V
+        return grid
+
+    def _parity(self, shape, p):
+        i, j = np.indices(shape)
+        return (i + j) % 2 == p
+
+    def _loss(self, shape, dtype):
+        # grains a toppling cell gives away, per cell (fewer at closed edges)
+        key = (shape, np.dtype(dtype))
+        loss = self._losses.get(key)
+        if loss is None:
+            loss = np.zeros(shape, dtype=np.int64)
+            for di, dj, p in self.offsets:
+                linked = np.ones(shape, dtype=bool) if p < 0 else self._parity(shape, p)
+                if self.boundary == 'closed' and dj:
+                    linked[:, -1 if dj > 0 else 0] = False
+                loss += linked
+            loss = self._losses[key] = loss.astype(dtype)
+        return loss
+
+    def topple(self, grid):
+        # one synchronous sweep in place with whole-array operations;
+        # returns the number of topplings
+        unstable = np.zeros(grid.shape, dtype=bool)
+        rows, columns = slice(1, -1), self._columns()
+        unstable[rows, columns] = grid[rows, columns] > self.K
+        count = int(np.count_nonzero(unstable))
+        if count:
+            u = unstable.astype(grid.dtype)
+            grid -= self._loss(grid.shape, grid.dtype) * u
+            for di, dj, p in self.offsets:
+                sent = u if p < 0 else u * self._parity(grid.shape, p)
+                sent = np.roll(sent, (di, dj), axis=(0, 1))
+                if self.boundary == 'closed' and dj:
+                    sent[:, 0 if dj > 0 else -1] = 0  # rolled across the edge
+                grid += sent
+        self.sink(grid)
+        return count
+
+    def relax(self, grid, site=None, engine='auto'):
+        # relaxes the grid in place and returns the avalanche size. The
+        # standard model goes to engine.relax(); the others run on their
+        # compiled kernel ('auto' or 'numba') or on topple() ('sweep' or
+        # 'frontier', and 'auto' without numba)
+        if self.standard:
+            return relax(grid, site, self.K, engine)
+        if engine not in ('auto', 'numba', 'sweep', 'frontier'):
+            raise ValueError(f"engine {engine!r} only runs the standard model, use 'numba' or 'frontier'")
+        if engine == 'numba' and not kernels.AVAILABLE:
+            raise RuntimeError("the 'numba' engine needs numba to be installed")
+        if engine in ('sweep', 'frontier') or not kernels.AVAILABLE:
+            avalanche_size = 0
+            while True:
+                count = self.topple(grid)
+                if count == 0:
+                    return avalanche_size
+                avalanche_size += count
+        if not grid.flags.c_contiguous:
+            work = np.ascontiguousarray(grid)
+            avalanche_size = self.relax(work, site, engine)
+            grid[...] = work
+            return avalanche_size
+        if self._kernel is None:
+            di, dj, parity = (tuple(column) for column in zip(*self.offsets))
+            self._kernel = kernels.model_kernel(di, dj, parity, self.boundary)
+        N, M = grid.shape
+        frontier = _buffer('stack', grid.size)
+        if site is None:
+            unstable = np.zeros(grid.shape, dtype=bool)
+            unstable[1:-1, self._columns()] = grid[1:-1, self._columns()] > self.K
+            seeds = np.flatnonzero(unstable)
+            n = seeds.size
+            frontier[:n] = seeds
+        else:
+            i, j = site
+            first = 1 if self.boundary == 'open' else 0
+            n = int(0 < i < N - 1 and first <= j < M - first and grid[i, j] > self.K)
+            frontier[0] = i * M + j
+        avalanche_size = 0
+        if n:
+            avalanche_size = int(self._kernel(grid, frontier, n, _buffer('following', grid.size),
+                                              _buffer('mark', grid.size), self.K))
+        self.sink(grid)
+        return avalanche_size
+
+    def stable_state(self, N, V, engine='auto'):
+        # the stable grid reached by relaxing the uniform V state
+        grid = self.initialize(N, V)
+        self.relax(grid, engine=engine)
+        return grid
@@ -0,0 +1,34 @@
+import numpy as np
+
+from .engine import Observation
+
+
+class AvalancheRecord:
+    # per-avalanche observables (see engine.Observation) in preallocated
+    # columnar arrays, one entry per avalanche. Appending only writes into the
+    # arrays; they are doubled if more avalanches arrive than were planned
+
+    columns = Observation._fields
+
+    def __init__(self, capacity=1024):
+        self._data = {name: np.zeros(capacity, dtype=np.float64 if name == 'radius' else np.int64)
+                      for name in self.columns}
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, name):
+        # the recorded values of one column
+        return self._data[name][:self.count]
+
+    def append(self, observation):
+        n = self.count
+        if n == len(self._data['size']):
+            for name, column in self._data.items():
+                grown = np.zeros(2 * max(n, 1), dtype=column.dtype)
+                grown[:n] = column
+                self._data[name] = grown
+        for name, value in zip(self.columns, observation):
+            self._data[name][n] = value
+        self.count = n + 1
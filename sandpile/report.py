@@ -0,0 +1,130 @@
+# Headless reporting: figures are drawn on matplotlib's non-interactive Agg
+# canvas (pyplot and its GUI backends are never used) and written to files by
+# a background worker thread, so a batch run never blocks on a window and
+# keeps simulating while figures are rendered. matplotlib is only imported
+# once the first figure is drawn.
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+def _figure(figsize):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def plot_size_distribution(path, sizes, counts, title, figsize=(10, 6)):
+    # log-log scatter of how often each avalanche size occurred
+    fig = _figure(figsize)
+    ax = fig.add_subplot()
+    ax.loglog(sizes, counts, 'bo', markersize=5)
+    ax.set_xlabel('Avalanche Size')
+    ax.set_ylabel('Frequency')
+    ax.set_title(title)
+    ax.grid(which="both", ls="-")
+    fig.savefig(path)
+
+
+def plot_size_histogram(path, sizes, counts, title, figsize=None, **style):
+    # histogram of avalanche sizes over 50 log-spaced bins
+    fig = _figure(figsize)
+    ax = fig.add_subplot()
+    bins = np.logspace(0, np.log10(max(sizes, default=0)+1), 50)
+    ax.hist(sizes, bins=bins, weights=counts, **style)
+    if np.any(np.asarray(sizes) > 0):  # log axes need at least one bar
+        ax.set_xscale('log')
+        ax.set_yscale('log')
+    ax.set_xlabel('Avalanche size (number of topplings)')
+    ax.set_ylabel('Number of avalanches')
+    ax.set_title(title)
+    fig.savefig(path)
+
+
+def plot_grids(path, grids, titles, figsize=None, **style):
+    # one imshow panel with a colorbar per grid, side by side
+    fig = _figure(figsize)
+    for n, (grid, title) in enumerate(zip(grids, titles)):
+        ax = fig.add_subplot(1, len(grids), n + 1)
+        im = ax.imshow(grid, cmap='viridis', **style)
+        ax.set_title(title)
+        fig.colorbar(im, ax=ax)
+    if len(grids) > 1:
+        fig.tight_layout()
+    fig.savefig(path)
+
+
+def plot_animation(path, frames, count, title, fps=10, figsize=(6, 6), **style):
+    # animated GIF of count grids taken one by one from the iterable frames,
+    # so they need not all be in memory; the colour scale is fixed by the
+    # first frame
+    from matplotlib.animation import PillowWriter
+    fig = _figure(figsize)
+    ax = fig.add_subplot()
+    frames = iter(frames)
+    first = next(frames)
+    im = ax.imshow(first, cmap='viridis', vmin=0, vmax=max(int(first.max()), 1), **style)
+    fig.colorbar(im, ax=ax)
+    writer = PillowWriter(fps=fps)
+    with writer.saving(fig, path, dpi=fig.dpi):
+        for n, grid in enumerate([first] + [None] * (count - 1)):
+            if grid is None:
+                grid = next(frames)
+            im.set_data(grid)
+            ax.set_title(f"{title}\nframe {n + 1} of {count}")
+            writer.grab_frame()
+
+
+class Reporter:
+    # queues figures for a background worker that writes them as PNG files
+    # into directory. Each method copies its data and returns at once with a
+    # future; close() (or leaving a with block) waits for all of them. A
+    # single worker thread keeps matplotlib calls serialised
+
+    def __init__(self, directory='figures'):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=1)
+        self._pending = []
+
+    def _submit(self, plot, name, *args, ext='png', **kwargs):
+        path = os.path.join(self.directory, f'{name}.{ext}')
+        future = self._pool.submit(plot, path, *args, **kwargs)
+        self._pending.append(future)
+        return future  # resolves to None once path is written
+
+    def size_distribution(self, stats, name, title, **kwargs):
+        # from an AvalancheStats collector
+        return self._submit(plot_size_distribution, name, *stats.size_counts(), title, **kwargs)
+
+    def size_histogram(self, stats, name, title, **kwargs):
+        return self._submit(plot_size_histogram, name, *stats.size_counts(), title, **kwargs)
+
+    def grid(self, grid, name, title, **kwargs):
+        return self._submit(plot_grids, name, [np.array(grid)], [title], **kwargs)
+
+    def grids(self, grids, name, titles, **kwargs):
+        return self._submit(plot_grids, name, [np.array(grid) for grid in grids], titles, **kwargs)
+
+    def animation(self, frames, name, title, every=1, **kwargs):
+        # from an AvalancheFrames recording (see frames.py), written as a GIF
+        count = len(range(0, len(frames), every)) + 1
+        return self._submit(plot_animation, name, frames.frames(every), count, title, ext='gif', **kwargs)
+
+    def close(self):
+        # waits for the queued figures and raises the first rendering error
+        try:
+            for future in self._pending:
+                future.result()
+        finally:
+            self._pending = []
+            self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,121 @@
+import numpy as np
+
+
+class AvalancheStats:
+    # streaming avalanche-size statistics in constant memory. The simulation
+    # loop feeds every avalanche size to add() (or a block of them to
+    # update()); only the running count, sum, min and max, an exact histogram
+    # of sizes and log-binned counts are kept. The arrays are preallocated and
+    # the exact histogram only grows (by doubling) when a new maximum is seen
+
+    def __init__(self, capacity=1024, bins_per_decade=10, decades=12):
+        self.histogram = np.zeros(capacity, dtype=np.int64)  # size -> count
+        self.bins_per_decade = bins_per_decade
+        self.decades = decades
+        # integer lower edges of the log bins; sizes of 0 are not log-binned
+        # and the last bin also collects everything above 10**decades
+        edges = np.unique(np.ceil(10 ** (np.arange(bins_per_decade * decades + 1) / bins_per_decade)))
+        self.log_edges = edges.astype(np.int64)
+        self.log_counts = np.zeros(self.log_edges.size, dtype=np.int64)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _grow(self, size):
+        capacity = self.histogram.size
+        while capacity <= size:
+            capacity *= 2
+        histogram = np.zeros(capacity, dtype=np.int64)
+        histogram[:self.histogram.size] = self.histogram
+        self.histogram = histogram
+
+    def add(self, size):
+        # records a single avalanche
+        size = int(size)
+        if size >= self.histogram.size:
+            self._grow(size)
+        self.histogram[size] += 1
+        if size:
+            self.log_counts[np.searchsorted(self.log_edges, size, 'right') - 1] += 1
+        self.count += 1
+        self.total += size
+        if self.min is None or size < self.min:
+            self.min = size
+        if self.max is None or size > self.max:
+            self.max = size
+
+    def update(self, sizes):
+        # records a block of avalanches at once
+        sizes = np.asarray(sizes, dtype=np.int64).ravel()
+        if not sizes.size:
+            return
+        top = int(sizes.max())
+        if top >= self.histogram.size:
+            self._grow(top)
+        self.histogram[:top + 1] += np.bincount(sizes)
+        nonzero = sizes[sizes > 0]
+        bins = np.searchsorted(self.log_edges, nonzero, 'right') - 1
+        self.log_counts += np.bincount(bins, minlength=self.log_counts.size)
+        self.count += sizes.size
+        self.total += int(sizes.sum())
+        low = int(sizes.min())
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = top if self.max is None else max(self.max, top)
+
+    def merge(self, other):
+        # adds the avalanches recorded by another collector
+        if other.bins_per_decade != self.bins_per_decade or other.log_counts.size != self.log_counts.size:
+            raise ValueError("cannot merge statistics with different log bins")
+        if other.count == 0:
+            return self
+        if other.max >= self.histogram.size:
+            self._grow(other.max)
+        self.histogram[:other.histogram.size] += other.histogram[:self.histogram.size]
+        self.log_counts += other.log_counts
+        self.count += other.count
+        self.total += other.total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def state(self):
+        # plain arrays and numbers describing the collector, e.g. for
+        # checkpoints; from_state() rebuilds an identical collector
+        return {
+            'histogram': self.histogram[:(self.max or 0) + 1],
+            'log_counts': self.log_counts,
+            'bins_per_decade': self.bins_per_decade,
+            'decades': self.decades,
+            'count': self.count,
+            'total': self.total,
+            'min': -1 if self.min is None else self.min,
+            'max': -1 if self.max is None else self.max,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        histogram = np.asarray(state['histogram'], dtype=np.int64)
+        stats = cls(max(histogram.size, 1), int(state['bins_per_decade']), int(state['decades']))
+        stats.histogram[:histogram.size] = histogram
+        stats.log_counts[:] = state['log_counts']
+        stats.count = int(state['count'])
+        stats.total = int(state['total'])
+        stats.min = None if int(state['min']) < 0 else int(state['min'])
+        stats.max = None if int(state['max']) < 0 else int(state['max'])
+        return stats
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else float('nan')
+
+    def size_counts(self):
+        # the sizes that occurred and how often each of them occurred
+        sizes = np.flatnonzero(self.histogram)
+        return sizes, self.histogram[sizes]
+
+    def log_binned(self):
+        # lower edges and counts of the occupied range of log bins
+        last = np.flatnonzero(self.log_counts)
+        stop = last[-1] + 1 if last.size else 0
+        return self.log_edges[:stop], self.log_counts[:stop]
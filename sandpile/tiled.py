@@ -0,0 +1,121 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+from . import kernels
+from .engine import K, _buffer, _frontier, zero_boundary
+
+# Domain-decomposed relaxation for very large grids. The interior rows are
+# split into bands (tiles), each relaxed in a private int64 copy with one
+# halo row above and one below, made when the tile first has work. A halo
+# row collects the grains the tile sends to its neighbour; between rounds
+# the halos are added to the neighbours' edge rows, and only tiles that
+# received grains run again.
+# By the abelian property the final grid and the number of topplings are
+# those of any other engine, although the tiles topple in a different order.
+# With numba the tiles run in worker threads on the compiled stack kernel,
+# which releases the GIL; without it the NumPy frontier engine is used
+
+
+# default height of a tile in rows; smaller tiles make a grain copy less
+# of the grid, larger ones pass fewer halos
+TILE_ROWS = 32
+
+
+@lru_cache(maxsize=None)
+def _bands(N, tiles):
+    # row ranges [a, b) of the tiles covering the interior rows 1..N-2
+    edges = np.linspace(1, N - 1, min(tiles, N - 2) + 1).round().astype(int).tolist()
+    return tuple(zip(edges[:-1], edges[1:]))
+
+
+def _pool(workers, _pools={}):
+    # worker threads, kept between avalanches
+    pool = _pools.get(workers)
+    if pool is None:
+        pool = _pools[workers] = ThreadPoolExecutor(max_workers=workers)
+    return pool
+
+
+def _relax_tile(tile, scratch, rows, K):
+    # relaxes one tile in place, starting from its unstable cells in the
+    # given tile rows (all of them when rows is None); the halo rows and
+    # boundary columns never topple. scratch is the tile's own buffer of
+    # tile.size entries, so tiles can run in parallel. Returns the number of
+    # topplings
+    M = tile.shape[1]
+    if rows is None:
+        rows = range(1, tile.shape[0] - 1)
+    seeds = [r * M + 1 + np.flatnonzero(tile[r, 1:-1] > K) for r in sorted(set(rows))]
+    seeds = np.concatenate(seeds) if seeds else np.zeros(0, dtype=np.int64)
+    if not seeds.size:
+        return 0
+    if kernels.AVAILABLE:
+        scratch[:seeds.size] = seeds
+        return int(kernels.relax_stack(tile, scratch, seeds.size, K))
+    return _frontier(tile, None, K, False, seeds=seeds, slot=scratch)[0]
+
+
+def _load(grid, bands, t):
+    # a private int64 copy of tile t with empty halo rows (owned by the
+    # neighbours) and its scratch buffer (the compiled kernel's worklist or
+    # the frontier engine's slots), kept with the engines' scratch storage
+    a, b = bands[t]
+    tile = grid[a - 1:b + 1].astype(np.int64)
+    tile[0] = tile[-1] = 0
+    return tile, _buffer(f'tile {t}', tile.size)
+
+
+def relax_tiled(grid, site=None, K=K, tiles=None, workers=None):
+    # relaxes the grid in place by tiles and returns the avalanche size.
+    # With a site only the tile holding it starts; other tiles must be
+    # stable, as for the other engines, and are copied only once grains
+    # reach them, so a small avalanche costs one band rather than the whole
+    # grid. tiles defaults to enough tiles of TILE_ROWS rows, at least one
+    # per CPU, and workers to the number of CPUs
+    N, M = grid.shape
+    if N < 3:
+        zero_boundary(grid)
+        return 0
+    cpus = os.cpu_count() or 1
+    tiles = tiles or max(cpus, -(-(N - 2) // TILE_ROWS))
+    bands = _bands(N, tiles)
+    if site is None:
+        pending = {t: None for t in range(len(bands))}
+    else:
+        i, j = site
+        pending = {t: [i - a + 1] for t, (a, b) in enumerate(bands) if a <= i < b}
+    work = {t: _load(grid, bands, t) for t in pending}
+    pool = _pool(workers or min(cpus, len(bands)))
+    avalanche_size = 0
+    while pending:
+        order = sorted(pending)
+        if len(order) == 1:
+            counts = [_relax_tile(*work[order[0]], pending[order[0]], K)]
+        else:
+            counts = pool.map(lambda t: _relax_tile(*work[t], pending[t], K), order)
+        avalanche_size += sum(counts)
+        # pass the grains collected in the halos on to the neighbouring tiles
+        received = {}
+        for t in order:
+            tile = work[t][0]
+            for u, halo, edge in ((t - 1, 0, -2), (t + 1, -1, 1)):
+                if 0 <= u < len(bands) and tile[halo].any():
+                    if u not in work:
+                        work[u] = _load(grid, bands, u)
+                    neighbour = work[u][0]
+                    neighbour[edge] += tile[halo]
+                    received.setdefault(u, []).append(edge % neighbour.shape[0])
+            tile[0] = tile[-1] = 0   # grains past rows 0 and N-1 are lost
+        pending = received
+    for t, (tile, _) in work.items():
+        a, b = bands[t]
+        tile[:, 0] = tile[:, -1] = 0
+        grid[a:b] = tile[1:-1]
+    if site is None:
+        zero_boundary(grid)
+    else:
+        grid[0] = grid[-1] = 0   # the columns of untouched tiles stay as they were
+    return avalanche_size
@@ -0,0 +1,80 @@
+from collections import namedtuple
+
+import numpy as np
+
+from .drive import STRATEGIES
+from .engine import K, relax
+
+# Fast-forwarding a driven pile through its transient. Grains are dropped in
+# rounds of many at once, at sites drawn from the run's strategy and RNG,
+# and each round is relaxed in one go by the bulk engine. The pile is
+# abelian, so a round ends on exactly the grid the same grains dropped one
+# by one would have left: the warm-up skips the single-grain avalanches of
+# the transient, not the statistics of the state it reaches. Rounds go on
+# until the pile is stationary, i.e. the boundary loses (nearly) as many
+# grains as are dropped, and the grid is recurrent by the burning test.
+
+# one warm-up round: grains dropped, topplings, grains lost to the boundary
+# and mean height of the interior afterwards
+Round = namedtuple('Round', ['grains', 'topplings', 'lost', 'mean_height'])
+
+# the rounds of a warm-up, whether it reached a recurrent grid (None for
+# models other than the standard one) and whether the pile was stationary
+# when it ended, which it need not be if max_rounds ran out first
+WarmUp = namedtuple('WarmUp', ['rounds', 'recurrent', 'stationary'])
+
+
+def is_recurrent(grid, K=K, engine='auto'):
+    # Dhar's burning test: a stable grid is recurrent iff adding one grain
+    # per sink neighbour to every cell and relaxing gives it back, every
+    # cell toppling exactly once
+    work = np.array(grid)
+    work[1, 1:-1] += 1
+    work[-2, 1:-1] += 1
+    work[1:-1, 1] += 1
+    work[1:-1, -2] += 1
+    topplings = relax(work, K=K, engine=engine)
+    return topplings == work[1:-1, 1:-1].size and np.array_equal(work, grid)
+
+
+def stationary(rounds, window=3, tolerance=0.02):
+    # whether the boundary lost as many grains as were dropped, within
+    # tolerance of them, in each of the last `window` rounds: a pile still
+    # filling up loses fewer, one still shedding excess mass more
+    return len(rounds) >= window and all(abs(r.lost - r.grains) <= tolerance * r.grains
+                                         for r in rounds[-window:])
+
+
+def warm_up(grid, strategy, rng, K=K, batch=None, window=3, tolerance=0.02, max_rounds=1000,
+            model=None, log=None):
+    # drops rounds of `batch` grains (default one per interior cell) on grid
+    # in place until it is stationary and recurrent, or for max_rounds
+    # rounds, and returns the WarmUp. The sites come from strategy (as in
+    # simulate()) and rng, so a driven run carries on with the same stream.
+    # A Model other than the standard one relaxes on its own kernel and is
+    # only checked for stationarity. log, if given, is called with every Round
+    drop = STRATEGIES[strategy] if isinstance(strategy, str) else strategy
+    standard = model is None or model.standard
+    K = K if model is None else model.K
+    N, M = grid.shape
+    batch = batch or (N - 2) * (M - 2)
+    # heights during a round can be far above what grid's dtype holds
+    work = grid.astype(np.int64)
+    rounds = []
+    while len(rounds) < max_rounds:
+        before = int(work.sum())
+        i, j = drop(rng, N, batch).T
+        work += np.bincount(i * M + j, minlength=work.size).reshape(work.shape)
+        if standard:
+            topplings = relax(work, K=K, engine='bulk')
+        else:
+            topplings = model.relax(work)
+        rounds.append(Round(batch, topplings, before + batch - int(work.sum()),
+                            float(work[1:-1, 1:-1].mean())))
+        if log is not None:
+            log(rounds[-1])
+        if stationary(rounds, window, tolerance) and (not standard or is_recurrent(work, K)):
+            break
+    grid[...] = work
+    return WarmUp(rounds, is_recurrent(work, K) if standard else None,
+                  stationary(rounds, window, tolerance))
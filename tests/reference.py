@@ -0,0 +1,32 @@
+# reference relaxation the engine tests compare against: unstable cells
+# toppled one at a time until none is left
+import numpy as np
+
+from sandpile.engine import DTYPE, K
+
+
+def per_cell(grid, K=K):
+    # returns (avalanche size, relaxed int64 copy of grid)
+    work = grid.astype(np.int64)
+    size = 0
+    while True:
+        unstable = np.argwhere(work[1:-1, 1:-1] > K) + 1
+        if not len(unstable):
+            break
+        for i, j in unstable:
+            while work[i, j] > K:
+                work[i, j] -= 4
+                work[i + 1, j] += 1
+                work[i - 1, j] += 1
+                work[i, j + 1] += 1
+                work[i, j - 1] += 1
+                size += 1
+    work[0, :] = work[-1, :] = work[:, 0] = work[:, -1] = 0
+    return size, work
+
+
+def random_grid(seed, N=16, high=8):
+    # an unstable grid with interior heights drawn from 0..high-1
+    grid = np.zeros((N, N), dtype=DTYPE)
+    grid[1:-1, 1:-1] = np.random.default_rng(seed).integers(0, high, (N - 2, N - 2))
+    return grid
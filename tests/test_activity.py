@@ -0,0 +1,34 @@
+# per-cell toppling counts must add up to the avalanche sizes
+import numpy as np
+import pytest
+
+from sandpile import kernels
+from sandpile.activity import ActivityMap
+from sandpile.drive import simulate, stable_state
+
+ENGINES = ['frontier'] + (['numba'] if kernels.AVAILABLE else [])
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_activity_adds_up_to_the_avalanche_sizes(engine):
+    grid = np.array(stable_state(20))
+    activity = ActivityMap(grid.shape, capacity=16)
+    sizes = simulate(grid, 'Random', 300, np.random.default_rng(6), engine=engine, activity=activity)
+    assert len(activity) == 300
+    assert activity.total.sum() == sizes.sum()
+    assert not activity.odometer.any()
+    assert [activity.avalanche_map(n).sum() for n in range(300)] == sizes.tolist()
+    assert sum(activity.avalanche_map(n) for n in range(300)).tolist() == activity.total.tolist()
+
+
+def test_activity_save_and_load(tmp_path):
+    grid = np.array(stable_state(20))
+    activity = ActivityMap(grid.shape)
+    simulate(grid, 'Middle', 100, np.random.default_rng(0), activity=activity)
+    path = str(tmp_path / 'run.activity.npz')
+    activity.save(path)
+    loaded = ActivityMap.load(path)
+    assert len(loaded) == len(activity)
+    assert np.array_equal(loaded.total, activity.total)
+    for n in (0, 50, 99):
+        assert np.array_equal(loaded.avalanche_map(n), activity.avalanche_map(n))
@@ -0,0 +1,23 @@
+# the power-law fit must recover the exponent of sampled sizes, and its
+# bootstrap must not depend on the number of worker processes
+import numpy as np
+
+from sandpile.analysis import bootstrap, estimate, fit_power_law
+
+
+def sampled(tau=1.5, top=200, n=10**5, seed=0):
+    p = np.arange(1, top, dtype=np.float64) ** -tau
+    return np.concatenate([[0], np.random.default_rng(seed).multinomial(n, p / p.sum())])
+
+
+def test_fit_recovers_the_exponent():
+    fit = fit_power_law(sampled(), cutoff=False)
+    assert abs(fit.tau - 1.5) < 0.02
+    result = estimate(sampled(), cutoff=False, resamples=50, workers=1)
+    assert result.tau_ci[0] < 1.5 < result.tau_ci[1]
+
+
+def test_bootstrap_does_not_depend_on_worker_count():
+    counts = sampled()
+    fit = fit_power_law(counts)
+    assert np.array_equal(bootstrap(counts, fit, 8, workers=1), bootstrap(counts, fit, 8, workers=3))
@@ -0,0 +1,17 @@
+# replicas relaxed together must match the same piles driven one by one
+import numpy as np
+import pytest
+
+from sandpile.batch import simulate_batch
+from sandpile.drive import batch_sites, simulate, site_streams, stable_state
+
+
+@pytest.mark.parametrize('strategy', ['Random', 'Edges'])
+def test_batch_matches_per_replica_runs(strategy):
+    B, N, count = 4, 20, 300
+    grids = np.stack([stable_state(N)] * B)
+    expected = grids.copy()
+    sizes = simulate_batch(grids, batch_sites(strategy, site_streams(7, B), N, count))
+    for b, rng in enumerate(site_streams(7, B)):
+        assert np.array_equal(simulate(expected[b], strategy, count, rng), sizes[b])
+    assert np.array_equal(grids, expected)
@@ -0,0 +1,27 @@
+# the bulk engine must relax piles far from stable exactly
+import numpy as np
+
+from sandpile.bulk import relax_bulk
+from sandpile.engine import relax
+
+
+def test_bulk_relaxes_a_large_pile_exactly():
+    pile = np.zeros((41, 41), dtype=np.int64)
+    pile[20, 20] = 20000
+    reference = pile.copy()
+    assert relax(pile, engine='bulk') == relax(reference, engine='frontier')
+    assert np.array_equal(pile, reference)
+
+
+def test_bulk_odometer_explains_the_final_grid():
+    # every cell ends with its grains, less four per toppling, plus one per
+    # toppling of each neighbour
+    pile = np.zeros((31, 31), dtype=np.int64)
+    pile[1:-1, 1:-1] = 9
+    start = pile.copy()
+    odometer = np.zeros(pile.shape, dtype=np.int64)
+    size = relax_bulk(pile, odometer=odometer)
+    assert odometer.sum() == size
+    u = odometer
+    expected = start[1:-1, 1:-1] - 4 * u[1:-1, 1:-1] + u[2:, 1:-1] + u[:-2, 1:-1] + u[1:-1, 2:] + u[1:-1, :-2]
+    assert np.array_equal(pile[1:-1, 1:-1], expected)
@@ -0,0 +1,40 @@
+# stable states must be computed once, keyed on the engine version, and
+# handed out copy-on-write
+import os
+
+import numpy as np
+
+from sandpile import cache, drive
+from sandpile.engine import ENGINE_VERSION
+
+
+def test_stable_state_is_computed_once(tmp_path, monkeypatch):
+    calls = []
+    relax = drive.stable_state
+    monkeypatch.setattr(drive, 'stable_state', lambda *args: calls.append(args) or relax(*args))
+    assert not cache.is_cached(12, directory=str(tmp_path))
+    first = cache.stable_state(12, directory=str(tmp_path))
+    second = cache.stable_state(12, directory=str(tmp_path))
+    assert len(calls) == 1
+    assert cache.is_cached(12, directory=str(tmp_path))
+    assert os.listdir(tmp_path) == [f'stable-N12-K3-V7-open-v{ENGINE_VERSION}.npy']
+    assert np.array_equal(first, second)
+    assert np.array_equal(second, relax(12))
+
+
+def test_cached_array_is_copy_on_write(tmp_path):
+    grid = cache.stable_state(12, directory=str(tmp_path))
+    path = tmp_path / os.listdir(tmp_path)[0]
+    on_disk = path.read_bytes()
+    grid[5, 5] += 1
+    grid[1:-1, 1:-1] = 0
+    assert path.read_bytes() == on_disk
+    assert not np.array_equal(cache.stable_state(12, directory=str(tmp_path)), grid)
+
+
+def test_new_engine_version_misses_the_cache(tmp_path, monkeypatch):
+    cache.stable_state(12, directory=str(tmp_path))
+    monkeypatch.setattr(cache, 'ENGINE_VERSION', ENGINE_VERSION + 1)
+    assert not cache.is_cached(12, directory=str(tmp_path))
+    cache.stable_state(12, directory=str(tmp_path))
+    assert len(os.listdir(tmp_path)) == 2
@@ -0,0 +1,51 @@
+# a run resumed from a checkpoint must be identical to an uninterrupted one
+import os
+
+import numpy as np
+
+from sandpile.activity import ActivityMap
+from sandpile.checkpoint import history_dir, load_checkpoint, resume, save_checkpoint
+from sandpile.drive import simulate, stable_state
+from sandpile.stats import AvalancheStats
+
+
+def test_resume_is_identical_to_an_uninterrupted_run(tmp_path):
+    total, first = 2000, 700
+    grid = np.array(stable_state(20))
+    expected = simulate(grid.copy(), 'Random', total, np.random.default_rng(5), stats=AvalancheStats())
+    rng = np.random.default_rng(5)
+    stats = simulate(grid, 'Random', first, rng, stats=AvalancheStats())
+    path = str(tmp_path / 'run.npz')
+    save_checkpoint(path, grid, rng, first, stats, 'Random', total)
+    resumed = resume(path)
+    for key, value in expected.state().items():
+        assert np.array_equal(resumed.state()[key], value)
+
+
+def test_checkpoints_append_the_activity_history(tmp_path):
+    total, first = 600, 200
+    grid = np.array(stable_state(16))
+    expected = ActivityMap(grid.shape)
+    simulate(grid.copy(), 'Random', total, np.random.default_rng(3), stats=AvalancheStats(),
+             activity=expected)
+    rng = np.random.default_rng(3)
+    stats, activity = AvalancheStats(), ActivityMap(grid.shape)
+    path = str(tmp_path / 'run.npz')
+    ends = os.path.join(history_dir(path), 'ends.bin')
+    for n in (first // 2, first):
+        simulate(grid, 'Random', first // 2, rng, stats=stats, activity=activity)
+        save_checkpoint(path, grid, rng, n, stats, 'Random', total, activity=activity,
+                        activity_saved=n - first // 2)
+        assert os.path.getsize(ends) == 8 * n
+    with np.load(path) as data:
+        assert 'activity_cells' not in data.files
+    # entries past the checkpoint, as left by a save that was interrupted,
+    # are cut off when the resumed run saves
+    with open(ends, 'ab') as f:
+        f.write(b'\0' * 8 * 50)
+    resume(path, every=0.0)
+    resumed = load_checkpoint(path).activity
+    assert os.path.getsize(ends) == 8 * total
+    assert np.array_equal(resumed.total, expected.total)
+    for n in (0, first - 1, first, total - 1):
+        assert np.array_equal(resumed.avalanche_map(n), expected.avalanche_map(n))
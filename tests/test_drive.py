@@ -0,0 +1,12 @@
+# drop sites must not depend on the block size they are drawn in
+import numpy as np
+
+from sandpile.drive import simulate, stable_state
+
+
+def test_sites_do_not_depend_on_block_size():
+    grids = [np.array(stable_state(20)) for _ in range(2)]
+    sizes = [simulate(grid, 'Edges', 500, np.random.default_rng(3), block=block)
+             for grid, block in zip(grids, (7, 4096))]
+    assert np.array_equal(*sizes)
+    assert np.array_equal(*grids)
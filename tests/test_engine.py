@@ -0,0 +1,29 @@
+# every engine must end on the same grid after the same number of
+# topplings as relaxing one cell at a time
+import numpy as np
+import pytest
+
+from reference import per_cell, random_grid
+from sandpile.drive import stable_state
+from sandpile.engine import ENGINES, relax
+
+
+@pytest.mark.parametrize('engine', ['auto'] + sorted(ENGINES))
+@pytest.mark.parametrize('seed', range(3))
+def test_engine_matches_per_cell_relaxation(engine, seed):
+    grid = random_grid(seed)
+    size, expected = per_cell(grid)
+    assert relax(grid, engine=engine) == size
+    assert np.array_equal(grid, expected)
+
+
+@pytest.mark.parametrize('engine', ['auto'] + sorted(ENGINES))
+def test_engine_matches_per_cell_single_grains(engine):
+    rng = np.random.default_rng(1)
+    grid = np.array(stable_state(20))
+    for _ in range(50):
+        i, j = rng.integers(1, 19, 2)
+        grid[i, j] += 1
+        size, expected = per_cell(grid)
+        assert relax(grid, (i, j), engine=engine) == size
+        assert np.array_equal(grid, expected)
@@ -0,0 +1,13 @@
+# ensemble results must not depend on how many processes run the jobs
+import numpy as np
+
+from sandpile.ensemble import Job, run_ensemble
+
+
+def test_ensemble_does_not_depend_on_worker_count(tmp_path, monkeypatch):
+    monkeypatch.setenv('SANDPILE_CACHE', str(tmp_path))
+    jobs = [Job(strategy, seed, 20, 300) for seed, strategy in enumerate(['Random', 'Middle', 'Edges'])]
+    serial = run_ensemble(jobs, workers=1)
+    parallel = run_ensemble(jobs, workers=2)
+    for a, b in zip(serial, parallel):
+        assert np.array_equal(a, b)
@@ -0,0 +1,50 @@
+# the event log must give back what was appended, and a log reopened with
+# start=n must keep its first n records before appending
+import numpy as np
+import pytest
+
+from sandpile.eventlog import EventLog, events_stats, read_events
+
+
+def records(count, seed):
+    rng = np.random.default_rng(seed)
+    return [(int(i), int(j), int(size)) for i, j, size in rng.integers(0, 1000, (count, 3))]
+
+
+def log(path, rows, **kwargs):
+    with EventLog(path, observables=False, chunk=16, **kwargs) as events:
+        for row in rows:
+            events.append(*row)
+
+
+def test_log_reads_back_its_records(tmp_path):
+    path = str(tmp_path / 'run.events')
+    rows = records(100, 0)
+    log(path, rows)
+    columns = read_events(path)
+    assert sorted(columns) == ['i', 'j', 'size']
+    assert np.array_equal(np.stack([columns['i'], columns['j'], columns['size']], axis=1), rows)
+    assert events_stats(path, chunk=7).total == sum(row[2] for row in rows)
+
+
+def test_start_truncates_and_then_appends(tmp_path):
+    path = str(tmp_path / 'run.events')
+    first, later = records(100, 1), records(50, 2)
+    log(path, first)
+    log(path, later, start=60)
+    assert np.array_equal(read_events(path)['size'], [row[2] for row in first[:60] + later])
+
+
+def test_new_log_replaces_the_old_one(tmp_path):
+    path = str(tmp_path / 'run.events')
+    log(path, records(100, 3))
+    rows = records(10, 4)
+    log(path, rows)
+    assert np.array_equal(read_events(path)['size'], [row[2] for row in rows])
+
+
+def test_start_beyond_the_log_is_refused(tmp_path):
+    path = str(tmp_path / 'run.events')
+    log(path, records(10, 5))
+    with pytest.raises(ValueError):
+        EventLog(path, observables=False, start=11)
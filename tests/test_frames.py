@@ -0,0 +1,48 @@
+# recorded frames must be the grids of a relaxation by topple() sweeps,
+# whichever way they are stepped through and after a save and load
+import numpy as np
+
+from sandpile.drive import stable_state
+from sandpile.engine import relax, topple
+from sandpile.frames import AvalancheFrames, record_avalanche
+
+
+def sweeps(grid):
+    # the grid after every synchronous sweep, starting with grid itself
+    work = grid.copy()
+    grids = [work.copy()]
+    while topple(work):
+        grids.append(work.copy())
+    return grids
+
+
+def recorded():
+    grid = np.array(stable_state(20))
+    grid[10, 10] += 1
+    expected = sweeps(grid)
+    reference = grid.copy()
+    size, frames = record_avalanche(grid, (10, 10))
+    assert size == relax(reference, (10, 10))
+    assert np.array_equal(grid, reference)
+    return frames, expected
+
+
+def test_frames_forwards_and_backwards():
+    frames, expected = recorded()
+    assert len(frames) == len(expected) - 1 > 10
+    for t in list(range(len(frames) + 1)) + list(range(len(frames), -1, -1)):
+        assert np.array_equal(frames.frame(t), expected[t])
+    for t in np.random.default_rng(0).integers(0, len(frames) + 1, 20):
+        assert np.array_equal(frames.frame(t), expected[t])
+    assert np.array_equal(list(frames.frames(every=4))[-1], expected[-1])
+
+
+def test_frames_save_and_load(tmp_path):
+    frames, expected = recorded()
+    path = str(tmp_path / 'avalanche.npz')
+    frames.save(path)
+    loaded = AvalancheFrames.load(path)
+    assert loaded.site == (10, 10)
+    assert len(loaded) == len(frames)
+    for t in (len(loaded), 0, len(loaded) // 2):
+        assert np.array_equal(loaded.frame(t), expected[t])
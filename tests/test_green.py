@@ -0,0 +1,50 @@
+# the predicted mean sizes must come from the lattice Green's function, and
+# validate() must accept a stationary run and reject wrong statistics
+import numpy as np
+import pytest
+
+from sandpile.drive import initialize_grid, simulate
+from sandpile.green import green_function, laplacian, mean_size_map, predicted_mean, validate
+from sandpile.stats import AvalancheStats
+from sandpile.warmup import warm_up
+
+pytest.importorskip('scipy')
+
+
+def test_mean_size_map_is_the_row_sums_of_the_green_function(tmp_path):
+    N = 7
+    G = np.linalg.inv(laplacian(N).toarray())
+    means = mean_size_map(N, str(tmp_path))
+    assert np.allclose(means[1:-1, 1:-1], G.sum(axis=1).reshape(N - 2, N - 2))
+    assert not means[[0, -1]].any() and not means[:, [0, -1]].any()
+    assert np.isclose(green_function(N, (2, 3)).sum(), means[2, 3])
+    assert np.isclose(predicted_mean(N, 'Middle', str(tmp_path)), means[N // 2, N // 2])
+
+
+def run(seed, grains=20000, N=12):
+    rng = np.random.default_rng(seed)
+    grid = initialize_grid(N, 0)
+    warm = warm_up(grid, 'Random', rng)
+    assert warm.stationary and warm.recurrent
+    return simulate(grid, 'Random', grains, rng, stats=AvalancheStats())
+
+
+def test_validate_accepts_a_stationary_run(tmp_path):
+    stats = run(0)
+    check = validate(stats, 12, 'Random', directory=str(tmp_path))
+    assert check.ok
+    assert check.rel_error < 0.05
+    assert validate(np.repeat(*stats.size_counts()), 12, 'Random', directory=str(tmp_path)) == check
+
+
+def test_validate_rejects_wrong_statistics(tmp_path):
+    stats = run(1)
+    wrong = AvalancheStats()
+    wrong.update(2 * np.repeat(*stats.size_counts()))
+    check = validate(wrong, 12, 'Random', directory=str(tmp_path))
+    assert not check.ok
+    assert check.rel_error > 0.5
+    # a pile that is not stationary yet has too few large avalanches
+    grid = initialize_grid(12, 0)
+    early = simulate(grid, 'Random', 200, np.random.default_rng(2), stats=AvalancheStats())
+    assert not validate(early, 12, 'Random', directory=str(tmp_path)).ok
@@ -0,0 +1,37 @@
+# grids are stored in one byte per cell; wider grids must convert exactly
+# and heights that do not fit must be refused rather than wrapped
+import os
+
+import numpy as np
+import pytest
+
+from sandpile.cache import load_grid
+from sandpile.engine import DTYPE, compact
+
+LEGACY = os.path.join(os.path.dirname(__file__), os.pardir, 'stable_starting_state.npy')
+
+
+def test_legacy_state_loads_as_compact_grid():
+    legacy = np.load(LEGACY)
+    grid = load_grid(LEGACY)
+    assert legacy.dtype != DTYPE and grid.dtype == DTYPE
+    assert np.array_equal(grid, legacy)
+
+
+def test_round_trip(tmp_path):
+    grid = load_grid(LEGACY)
+    path = str(tmp_path / 'grid.npy')
+    np.save(path, grid.astype(np.int64))
+    assert np.array_equal(load_grid(path), grid)
+
+
+@pytest.mark.parametrize('height', [256, 300, -1])
+def test_heights_that_do_not_fit_are_refused(tmp_path, height):
+    grid = np.zeros((5, 5), dtype=np.int64)
+    grid[2, 2] = height
+    with pytest.raises(ValueError):
+        compact(grid)
+    path = str(tmp_path / 'grid.npy')
+    np.save(path, grid)
+    with pytest.raises(ValueError):
+        load_grid(path)
@@ -0,0 +1,53 @@
+# hooks must see every avalanche with its sweep count and every every-th
+# sweep with its frontier, the same for all engines that count sweeps
+import numpy as np
+import pytest
+
+from sandpile import kernels
+from sandpile.drive import simulate, stable_state
+from sandpile.hooks import FrontierTrace, Hooks, SweepCounter
+from sandpile.observables import AvalancheRecord
+
+ENGINES = ['sweep', 'frontier'] + (['numba'] if kernels.AVAILABLE else [])
+
+
+def profiled(engine, every=1, observe=False, grains=200):
+    # (durations seen by the avalanche hooks, FrontierTrace, SweepCounter,
+    # durations recorded by relax_observed() when observe is set)
+    durations = []
+    hooks = Hooks(avalanche=[lambda n, site, size, duration, seconds: durations.append(duration)],
+                  every=every)
+    trace, counter = hooks.add(FrontierTrace()), hooks.add(SweepCounter())
+    record = AvalancheRecord() if observe else None
+    simulate(np.array(stable_state(20)), 'Random', grains, np.random.default_rng(8), engine=engine,
+             hooks=hooks, record=record)
+    return durations, trace, counter, None if record is None else record['duration']
+
+
+@pytest.mark.parametrize('engine', [engine for engine in ENGINES if engine != 'sweep'])
+def test_sweep_counts_match_the_observed_durations(engine):
+    durations, _, counter, _ = profiled(engine)
+    observed, _, _, recorded = profiled(engine, observe=True)
+    assert durations == observed == recorded.tolist()
+    assert counter.stats.count == 200 and counter.stats.total == sum(durations)
+    assert counter.stats.max == max(durations)
+
+
+@pytest.mark.parametrize('every', [1, 3])
+@pytest.mark.parametrize('engine, observe', [(engine, False) for engine in ENGINES]
+                         + [(engine, True) for engine in ENGINES if engine != 'sweep'])
+def test_sampled_sweeps_are_the_multiples_of_every(engine, observe, every):
+    durations, trace, _, _ = profiled(engine, every, observe)
+    expected = [(n, sweep) for n, duration in enumerate(durations)
+                for sweep in range(every, duration + 1, every)]
+    assert list(zip(trace['avalanche'].tolist(), trace['sweep'].tolist())) == expected
+
+
+@pytest.mark.parametrize('every', [1, 2])
+@pytest.mark.parametrize('engine', ENGINES)
+def test_frontiers_match_the_numpy_frontier_engine(engine, every):
+    _, reference, _, _ = profiled('frontier', every)
+    _, trace, _, _ = profiled(engine, every)
+    assert len(trace) == len(reference) > 0
+    for column in FrontierTrace.columns:
+        assert np.array_equal(trace[column], reference[column])
@@ -0,0 +1,46 @@
+# watch() must follow a publisher through a run to its final reading, and
+# closing the publisher must leave neither its socket nor its thread behind
+import threading
+
+import numpy as np
+
+from sandpile.drive import simulate, stable_state
+from sandpile.metrics import MetricsPublisher, watch
+from sandpile.stats import AvalancheStats
+
+
+def test_watch_follows_a_run_until_it_is_done(tmp_path):
+    total = 3000
+    address = str(tmp_path / 'run.sock')
+    stats = AvalancheStats()
+    publisher = MetricsPublisher(stats, address, total, interval=0.02)
+    readings, errors, connected = [], [], threading.Event()
+
+    def show(reading):
+        readings.append(reading)
+        connected.set()
+
+    def tail():
+        try:
+            watch([address], show, retry=5.0)
+        except Exception as error:
+            errors.append(error)
+
+    watcher = threading.Thread(target=tail)
+    watcher.start()
+    try:
+        assert connected.wait(10.0)
+        simulate(np.array(stable_state(16)), 'Random', total, np.random.default_rng(2), stats=stats)
+    finally:
+        publisher.close()
+    watcher.join(10.0)
+    assert not watcher.is_alive() and not errors
+
+    assert [reading['done'] for reading in readings] == [False] * (len(readings) - 1) + [True]
+    counts = [reading['avalanches'] for reading in readings]
+    assert counts == sorted(counts)
+    last = readings[-1]
+    assert last['avalanches'] == total and last['target'] == total and last['name'] == 'run'
+    assert last['topplings'] == stats.total and last['max_size'] == stats.max
+    assert not (tmp_path / 'run.sock').exists()
+    assert not any(thread.name.startswith('metrics ') for thread in threading.enumerate())
@@ -0,0 +1,27 @@
+# compiled model kernels must match Model.topple() sweeps, and the standard
+# model must match the engines
+import numpy as np
+import pytest
+
+from sandpile import kernels
+from sandpile.engine import relax
+from sandpile.models import BOUNDARIES, LATTICES, Model
+
+
+@pytest.mark.skipif(not kernels.AVAILABLE, reason="needs numba")
+@pytest.mark.parametrize('boundary', BOUNDARIES)
+@pytest.mark.parametrize('lattice', sorted(LATTICES))
+def test_model_kernel_matches_sweeps(lattice, boundary):
+    model = Model(lattice, boundary=boundary)
+    compiled = model.initialize(24, model.K + 3)
+    swept = compiled.copy()
+    assert model.relax(compiled, engine='numba') == model.relax(swept, engine='sweep')
+    assert np.array_equal(compiled, swept)
+
+
+def test_standard_model_matches_engines():
+    model = Model()
+    grid = model.initialize(20, 7)
+    reference = grid.copy()
+    assert model.relax(grid) == relax(reference)
+    assert np.array_equal(grid, reference)
@@ -0,0 +1,51 @@
+# the observables recorded in the relaxation pass must match a full-grid
+# relaxation: area, duration and radius from its sweeps, lost grains from
+# mass balance
+import numpy as np
+import pytest
+
+from sandpile import kernels
+from sandpile.drive import stable_state
+from sandpile.engine import K, relax_observed, topple
+
+ENGINES = ['frontier'] + (['numba'] if kernels.AVAILABLE else [])
+
+
+def swept(grid, site):
+    # (size, area, duration, radius, lost) of relaxing grid with topple()
+    work = grid.astype(np.int64)
+    toppled = np.zeros(grid.shape, dtype=bool)
+    size = duration = 0
+    while True:
+        unstable = work[1:-1, 1:-1] > K
+        if not unstable.any():
+            break
+        toppled[1:-1, 1:-1] |= unstable
+        size += topple(work)
+        duration += 1
+    i, j = np.nonzero(toppled)
+    radius = float(np.sqrt(((i - site[0])**2 + (j - site[1])**2).max())) if i.size else 0.0
+    return size, int(toppled.sum()), duration, radius, int(grid.sum() - work.sum())
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_observables_match_full_grid_sweeps(engine):
+    rng = np.random.default_rng(4)
+    grid = np.array(stable_state(24))
+    for _ in range(100):
+        i, j = rng.integers(1, 23, 2)
+        grid[i, j] += 1
+        expected = swept(grid, (i, j))
+        before = int(grid.sum())
+        observation = relax_observed(grid, (i, j), engine=engine)
+        assert tuple(observation) == pytest.approx(expected)
+        assert observation.lost == before - int(grid.sum())
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_grain_on_the_boundary_is_lost(engine):
+    grid = np.array(stable_state(24))
+    before = int(grid.sum())
+    grid[0, 5] += 1
+    assert tuple(relax_observed(grid, (0, 5), engine=engine)) == (0, 0, 0, 0.0, 1)
+    assert int(grid.sum()) == before
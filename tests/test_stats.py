@@ -0,0 +1,50 @@
+# the streaming collector must agree with statistics of the stored sizes
+import numpy as np
+
+from sandpile.stats import AvalancheStats
+
+
+def sizes(seed, count=2000):
+    return np.minimum(np.random.default_rng(seed).zipf(1.5, count) - 1, 10**4)
+
+
+def assert_same(a, b):
+    for key, value in a.state().items():
+        assert np.array_equal(b.state()[key], value), key
+
+
+def test_merge_matches_one_collector():
+    first, second = sizes(0), sizes(1)
+    merged = AvalancheStats(capacity=4)
+    merged.update(first)
+    other = AvalancheStats()
+    for size in second:
+        other.add(size)
+    merged.merge(other)
+    expected = AvalancheStats()
+    expected.update(np.concatenate([first, second]))
+    assert_same(expected, merged)
+    assert merged.count == 4000
+    assert merged.min == min(first.min(), second.min())
+    assert merged.max == max(first.max(), second.max())
+    assert merged.mean == np.concatenate([first, second]).mean()
+
+
+def test_merge_of_an_empty_collector_changes_nothing():
+    stats = AvalancheStats()
+    stats.update(sizes(2))
+    before = stats.state()
+    stats.merge(AvalancheStats())
+    assert_same(AvalancheStats.from_state(before), stats)
+
+
+def test_state_round_trip():
+    stats = AvalancheStats()
+    stats.update(sizes(3))
+    restored = AvalancheStats.from_state(stats.state())
+    assert_same(stats, restored)
+    assert restored.size_counts()[0].tolist() == stats.size_counts()[0].tolist()
+    restored.add(10**6)
+    assert restored.max == 10**6
+    empty = AvalancheStats.from_state(AvalancheStats().state())
+    assert empty.count == 0 and empty.min is None and empty.max is None
@@ -0,0 +1,54 @@
+# the tiled engine must match per-cell relaxation whatever the number of
+# tiles and workers, including avalanches that bring in neighbouring tiles
+import numpy as np
+import pytest
+
+from reference import per_cell, random_grid
+from sandpile import kernels, tiled
+from sandpile.drive import stable_state
+from sandpile.tiled import relax_tiled
+
+
+@pytest.mark.parametrize('tiles, workers', [(1, 1), (3, 2), (7, 3), (40, 4)])
+def test_tiled_matches_per_cell_relaxation(tiles, workers):
+    grid = random_grid(tiles, N=30)
+    size, expected = per_cell(grid)
+    assert relax_tiled(grid, tiles=tiles, workers=workers) == size
+    assert np.array_equal(grid, expected)
+
+
+@pytest.mark.parametrize('tiles, workers', [(3, 1), (7, 3)])
+def test_tiled_matches_per_cell_single_grains(tiles, workers):
+    rng = np.random.default_rng(2)
+    grid = np.array(stable_state(30))
+    for _ in range(100):
+        i, j = rng.integers(0, 30, 2)
+        grid[i, j] += 1
+        size, expected = per_cell(grid)
+        assert relax_tiled(grid, (i, j), tiles=tiles, workers=workers) == size
+        assert np.array_equal(grid, expected)
+
+
+
+
+def test_numpy_tiles_relax_in_parallel(monkeypatch):
+    # without numba the tiles run the frontier engine in worker threads.
+    # Equal tiles must each have their own scratch storage, and every tile
+    # must be stable after its run: the engine only runs a tile again when
+    # grains reach it, so a cell dropped from the frontier may be missed
+    monkeypatch.setattr(kernels, 'AVAILABLE', False)
+    relax_tile, scratches = tiled._relax_tile, set()
+
+    def checked(tile, scratch, rows, K):
+        size = relax_tile(tile, scratch, rows, K)
+        assert not (tile[1:-1, 1:-1] > K).any()
+        scratches.add(id(scratch))
+        return size
+
+    monkeypatch.setattr(tiled, '_relax_tile', checked)
+    for seed in range(3):
+        grid = random_grid(seed, N=42)
+        size, expected = per_cell(grid)
+        assert relax_tiled(grid, tiles=4, workers=4) == size
+        assert np.array_equal(grid, expected)
+    assert len(scratches) == 4
@@ -0,0 +1,37 @@
+# the warm-up must reach the recurrent, stationary state, say when it ran
+# out of rounds first, and end where single drops of its grains would
+import numpy as np
+
+from sandpile.drive import initialize_grid, random_sites, stable_state
+from sandpile.engine import relax
+from sandpile.warmup import is_recurrent, stationary, warm_up
+
+
+def test_warm_up_ends_recurrent_and_stationary():
+    grid = initialize_grid(30, 0)
+    warm = warm_up(grid, 'Random', np.random.default_rng(0))
+    assert warm.recurrent and warm.stationary
+    assert stationary(warm.rounds) and is_recurrent(grid)
+    assert grid.dtype == initialize_grid(30).dtype and grid.max() <= 3
+
+
+def test_warm_up_reports_the_round_limit():
+    grid = initialize_grid(30, 0)
+    warm = warm_up(grid, 'Random', np.random.default_rng(0), batch=5, max_rounds=20)
+    assert len(warm.rounds) == 20
+    assert not warm.stationary and not warm.recurrent
+
+
+def test_rounds_end_where_single_drops_would():
+    grid = initialize_grid(20, 0)
+    warm_up(grid, 'Random', np.random.default_rng(1), batch=50, max_rounds=4)
+    expected = initialize_grid(20, 0)
+    for i, j in random_sites(np.random.default_rng(1), 20, 200).tolist():
+        expected[i, j] += 1
+        relax(expected, (i, j))
+    assert np.array_equal(grid, expected)
+
+
+def test_burning_test():
+    assert is_recurrent(stable_state(20))
+    assert not is_recurrent(initialize_grid(20, 0))